@@ -0,0 +1,381 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SERIES_ID = 3001
+SINGLE_ITEM_ID = 1001
+MEDIA_FILES = ('video.mp4', 'audio.mp4', 'subs.vtt')
+
+MASTER_PLAYLIST = """#EXTM3U
+#EXT-X-INDEPENDENT-SEGMENTS
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac",NAME="Dansk",LANGUAGE="da",AUTOSELECT=YES,DEFAULT=YES,URI="audio/playlist.m3u8"
+#EXT-X-MEDIA:TYPE=SUBTITLES,GROUP-ID="subs",NAME="Dansk",LANGUAGE="da",AUTOSELECT=YES,URI="subs/playlist.m3u8"
+#EXT-X-STREAM-INF:BANDWIDTH=12000000,AVERAGE-BANDWIDTH=11000000,CODECS="mp4v.20.9,mp4a.40.2",RESOLUTION=1280x720,FRAME-RATE=25.000,AUDIO="aac",SUBTITLES="subs"
+video/playlist.m3u8
+"""
+
+
+def build_fixtures(fixtures_dir, duration):
+    # Real fragmented MP4 payloads, so the ffmpeg merge at the end of each
+    # download does the same work it would on DR content.
+    marker = os.path.join(fixtures_dir, f'.complete-{duration}')
+    if os.path.exists(marker):
+        return
+    os.makedirs(fixtures_dir, exist_ok=True)
+    fragmented = ['-movflags', '+frag_keyframe+empty_moov+default_base_moof']
+    commands = [
+        ['-f', 'lavfi', '-i', f'testsrc2=duration={duration}:size=1280x720:rate=25',
+         '-c:v', 'mpeg4', '-q:v', '1', '-g', '50', *fragmented, 'video.mp4'],
+        ['-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+         '-c:a', 'aac', '-b:a', '128k', *fragmented, 'audio.mp4'],
+    ]
+    for stream_type in ('video', 'audio'):
+        commands.append(['-i', f'{stream_type}.mp4', '-c', 'copy', '-f', 'hls', '-hls_time', '4',
+                         '-hls_segment_type', 'fmp4', '-hls_playlist_type', 'vod',
+                         '-hls_fmp4_init_filename', f'{stream_type}-init.mp4',
+                         '-hls_segment_filename', f'{stream_type}-%d.m4s', f'{stream_type}-segments.m3u8'])
+    for command in commands:
+        subprocess.run(['ffmpeg', '-loglevel', 'error', '-y', *command], cwd=fixtures_dir, check=True)
+
+    with open(os.path.join(fixtures_dir, 'subs.vtt'), 'w', encoding='utf-8') as file:
+        file.write("WEBVTT\n\n")
+        for second in range(0, duration, 5):
+            start, end = divmod(second, 60), divmod(second + 4, 60)
+            file.write(f"00:{start[0]:02d}:{start[1]:02d}.000 --> 00:{end[0]:02d}:{end[1]:02d}.000\nUndertekst {second}\n\n")
+    open(marker, 'w').close()
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = None
+    random = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self._delay()
+        self.rfile.read(int(self.headers.get('content-length', 0)))
+        if self._inject_error():
+            return
+        if urlsplit(self.path).path == '/api/authorization/anonymous-sso':
+            return self._send_json([{'type': 'UserAccount', 'value': 'bench.token', 'expirationDate': '2099-01-01T00:00:00Z'}])
+        self.send_error(404)
+
+    def do_GET(self):
+        self._delay()
+        if self._inject_error():
+            return
+        url = urlsplit(self.path)
+        parts = url.path.strip('/').split('/')
+        if parts[:2] == ['api', 'items']:
+            return self._send_json(self._get_item(int(parts[2])))
+        if parts[:3] == ['api', 'account', 'items']:
+            item_id = int(parts[3])
+            return self._send_json([{
+                'url': f'http://{self.headers["host"]}/hls/{item_id}/master.m3u8',
+                'format': 'video/hls',
+                'accessService': 'StandardVideo',
+            }])
+        if parts[:2] == ['api', 'page']:
+            return self._send_json(self._get_page(parse_qs(url.query)['path'][0]))
+        if parts[:2] == ['api', 'lists']:
+            return self._send_json(self._get_list(int(parts[2]), int(parse_qs(url.query)['page'][0])))
+        if parts[0] == 'hls':
+            return self._send_media('/'.join(parts[2:]))
+        self.send_error(404)
+
+    def _delay(self):
+        if self.config['latency']:
+            time.sleep(self.config['latency'])
+
+    def _inject_error(self):
+        if self.random.random() >= self.config['error_rate']:
+            return False
+        body = b'Service Unavailable'
+        self.send_response(503)
+        self.send_header('Retry-After', '0')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+    def _get_item(self, item_id):
+        item = {
+            'customId': f'urn:dr:mu:programcard:bench{item_id}',
+            'title': f'Benchmark {item_id}',
+            'description': 'Syntetisk testindhold fra 2024',
+            'duration': self.config['duration'],
+        }
+        if item_id != SINGLE_ITEM_ID:
+            season_number, episode_number = divmod(item_id - 100000, 1000)
+            item.update({
+                'title': 'Benchmark',
+                'season': {'title': 'Benchmark', 'seasonNumber': season_number},
+                'episodeNumber': episode_number,
+                'episodeName': f'Benchmark: Afsnit {episode_number}',
+            })
+        return item
+
+    def _get_page(self, path):
+        display_id, page_id = path.rsplit('/', 1)[1].rsplit('_', 1)
+        if path.startswith('/serie/'):
+            seasons = [{'path': f'/drtv/saeson/benchmark-{number}_{2000 + number}'}
+                       for number in range(1, self.config['seasons'] + 1)]
+            return {'entries': [{'item': {'show': {'seasons': {'items': seasons}}}}]}
+        season_number = int(page_id) - 2000
+        return {'entries': [{'item': {'seasonNumber': season_number, 'episodes': self._get_list(season_number, 1)}}]}
+
+    def _get_list(self, season_number, page):
+        # Episode lists are paged like the real API: each page links to the
+        # next one until the season is exhausted.
+        page_size = self.config.get('page_size') or self.config['episodes']
+        first = (page - 1) * page_size + 1
+        last = min(page * page_size, self.config['episodes'])
+        episode_list = {
+            'items': [{'path': f'/drtv/episode/benchmark_{100000 + season_number * 1000 + number}'}
+                      for number in range(first, last + 1)],
+            'paging': {'page': page, 'size': page_size, 'total': self.config['episodes']},
+        }
+        if last < self.config['episodes']:
+            episode_list['paging']['next'] = f'/lists/{season_number}?page={page + 1}'
+        return episode_list
+
+    def _send_json(self, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_media(self, name):
+        if name == 'master.m3u8':
+            return self._send_bytes(MASTER_PLAYLIST.encode('utf-8'), 'application/vnd.apple.mpegurl')
+        if name == 'subs.vtt':
+            return self._send_file('subs.vtt')
+        stream_type, _, filename = name.partition('/')
+        if filename == 'playlist.m3u8':
+            if self.config['layout'] == 'segments':
+                return self._send_file(f'{stream_type}-segments.m3u8')
+            playlist = f'#EXTM3U\n#EXT-X-VERSION:7\n#EXT-X-MAP:URI="{stream_type}.mp4"\n#EXT-X-ENDLIST\n'
+            return self._send_bytes(playlist.encode('utf-8'), 'application/vnd.apple.mpegurl')
+        return self._send_file(filename, stream=True)
+
+    def _send_file(self, filename, stream=False):
+        path = os.path.join(self.config['fixtures_dir'], os.path.basename(filename))
+        if not os.path.isfile(path):
+            return self.send_error(404)
+        with open(path, 'rb') as file:
+            data = file.read()
+        self._send_bytes(data, 'application/octet-stream', stream)
+
+    def _send_bytes(self, data, content_type, stream=False):
+        start, end = 0, len(data) - 1
+        range_header = self.headers.get('range')
+        if range_header:
+            first, _, last = range_header.split('=', 1)[1].partition('-')
+            start, end = int(first), min(int(last) if last else end, end)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', f'"fixture-{len(data)}"')
+        self.end_headers()
+
+        body = memoryview(data)[start:end + 1]
+        if stream and self.random.random() < self.config['drop_rate']:
+            # Drop the connection halfway through the body.
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        chunk_size = 64 * 1024
+        bandwidth = self.config['bandwidth']
+        for offset in range(0, len(body), chunk_size):
+            self.wfile.write(body[offset:offset + chunk_size])
+            if bandwidth:
+                time.sleep(min(chunk_size, len(body) - offset) / bandwidth)
+
+
+def serve(port, config, ready):
+    handler = type('Handler', (FixtureHandler,), {'config': config, 'random': random.Random(config['seed'])})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    ready.set()
+    server.serve_forever()
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def get_peak_rss():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def get_url(kind):
+    if kind == 'item':
+        return f'https://www.dr.dk/drtv/episode/benchmark_{SINGLE_ITEM_ID}'
+    if kind == 'season':
+        return 'https://www.dr.dk/drtv/saeson/benchmark-1_2001'
+    return f'https://www.dr.dk/drtv/serie/benchmark_{SERIES_ID}'
+
+def main():
+    parser = argparse.ArgumentParser(description="Run drtv_dl.main.download end to end against a local DR API and CDN stand-in")
+    parser.add_argument("--kind", choices=["item", "season", "series"], default="season", help="What the benchmark URL points at")
+    parser.add_argument("--episodes", type=int, default=4, help="Episodes per season")
+    parser.add_argument("--seasons", type=int, default=2, help="Seasons in the series")
+    parser.add_argument("--page-size", type=int, default=24, help="Episodes per page of a season's episode list")
+    parser.add_argument("--duration", type=int, default=30, help="Length of the fixture media in seconds")
+    parser.add_argument("--layout", choices=["file", "segments"], default="file", help="Serve each track as one MAP file or as HLS segments")
+    parser.add_argument("--latency", type=float, default=0, help="Added latency per request in milliseconds")
+    parser.add_argument("--bandwidth", default=None, help="Bandwidth per connection, e.g. 20M (bytes per second)")
+    parser.add_argument("--error-rate", type=float, default=0, help="Probability of answering a request with 503")
+    parser.add_argument("--drop-rate", type=float, default=0, help="Probability of dropping a media response halfway")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for failure injection")
+    parser.add_argument("--concurrent-episodes", type=int, default=1, help="Passed to download()")
+    parser.add_argument("--parts", type=int, default=None, help="Passed to download()")
+    parser.add_argument("--stream-merge", action="store_true", help="Passed to download()")
+    parser.add_argument("--merge-workers", type=int, default=None, help="Passed to download()")
+    parser.add_argument("--muxer", choices=["ffmpeg", "native"], default="ffmpeg", help="Passed to download()")
+    parser.add_argument("--cfmt", default="mkv", help="Passed to download()")
+    parser.add_argument("--no-subs", action="store_true", help="Download without subtitles")
+    parser.add_argument("--metrics-json", default=None, help="Passed to download()")
+    parser.add_argument("--profile", default=None, help="Passed to download()")
+    parser.add_argument("--fixtures-dir", default=os.path.join(tempfile.gettempdir(), 'drtv-dl-bench-fixtures'), help="Where generated media fixtures are kept between runs")
+    parser.add_argument("--keep", action="store_true", help="Keep the downloaded files")
+    args = parser.parse_args()
+
+    build_fixtures(args.fixtures_dir, args.duration)
+
+    from drtv_dl.utils.helpers import parse_size
+    config = {
+        'fixtures_dir': args.fixtures_dir,
+        'duration': args.duration,
+        'layout': args.layout,
+        'episodes': args.episodes,
+        'seasons': args.seasons,
+        'page_size': args.page_size,
+        'latency': args.latency / 1000,
+        'bandwidth': parse_size(args.bandwidth) if args.bandwidth else None,
+        'error_rate': args.error_rate,
+        'drop_rate': args.drop_rate,
+        'seed': args.seed,
+    }
+    port = get_free_port()
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=serve, args=(port, config, ready), daemon=True)
+    server.start()
+    ready.wait(10)
+    base_url = f'http://127.0.0.1:{port}'
+
+    work_dir = tempfile.mkdtemp(prefix='drtv-dl-bench-')
+    original_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        from drtv_dl import main as drtv_main
+        from drtv_dl.utils.merger import Merger
+        from drtv_dl.exceptions import DownloadError
+        from drtv_dl.utils.session import connection_stats
+        from drtv_dl.utils.retry import retry_stats
+        from drtv_dl.utils.metrics import metrics
+        from drtv_dl.extractor import InfoExtractor, SeasonInfoExtractor, SeriesInfoExtractor
+
+        # Merger resolves paths against the working directory at import time.
+        Merger.cwd = work_dir
+        InfoExtractor.ITEM_API_URL = f'{base_url}/api/items/{{}}'
+        InfoExtractor.STREAM_API_URL = f'{base_url}/api/account/items/{{}}/videos'
+        InfoExtractor.ANONYMOUS_SSO_URL = f'{base_url}/api/authorization/anonymous-sso'
+        SeasonInfoExtractor.SEASON_API_URL = f'{base_url}/api/page'
+        SeriesInfoExtractor.SERIES_API_URL = f'{base_url}/api/page'
+        SeasonInfoExtractor.API_BASE_URL = SeriesInfoExtractor.API_BASE_URL = f'{base_url}/api/'
+
+        first_extract = []
+        extract = InfoExtractor.extract
+
+        def record_first_extract(self, url):
+            if not first_extract:
+                first_extract.append(time.perf_counter())
+            return extract(self, url)
+
+        InfoExtractor.extract = record_first_extract
+
+        error = None
+        started = time.perf_counter()
+        try:
+            drtv_main.download(
+                get_url(args.kind),
+                resolution='720p',
+                include_subs=not args.no_subs,
+                cfmt=args.cfmt,
+                muxer=args.muxer,
+                suppress_output=True,
+                progress='off',
+                concurrent_episodes=args.concurrent_episodes,
+                parts=args.parts,
+                stream_merge=args.stream_merge,
+                merge_workers=args.merge_workers,
+                cache_dir=os.path.join(work_dir, 'cache'),
+                token_cache=False,
+                http_cache='off',
+                metrics_json=args.metrics_json and os.path.abspath(os.path.join(original_dir, args.metrics_json)),
+                profile=args.profile and os.path.abspath(os.path.join(original_dir, args.profile)),
+            )
+        except DownloadError as e:
+            error = e
+        wall_time = time.perf_counter() - started
+
+        outputs = [name for name in os.listdir(work_dir) if name.endswith(f'.{args.cfmt}')]
+        media_size = sum(os.path.getsize(os.path.join(args.fixtures_dir, name)) for name in MEDIA_FILES)
+        totals = metrics.to_dict()['totals']
+
+        print(f"{args.kind}, {len(outputs)} item(s) of {media_size / 1024 ** 2:.1f} MiB, layout={args.layout}, "
+              f"latency={args.latency:g} ms, bandwidth={args.bandwidth or 'unlimited'}, "
+              f"errors={args.error_rate:g}, drops={args.drop_rate:g}")
+        # Phases of concurrent episodes or tracks overlap, so their totals
+        # can add up to more than the wall time.
+        print(f"{'phase':<16}{'calls':>6}{'total s':>10}{'mean s':>10}")
+        for phase, timing in totals['phases'].items():
+            print(f"{phase:<16}{timing['calls']:>6}{timing['seconds']:>10.3f}{timing['seconds'] / timing['calls']:>10.3f}")
+        print(f"wall time       {wall_time:.3f} s")
+        if first_extract:
+            print(f"first episode   {first_extract[0] - started:.3f} s")
+        print(f"throughput      {totals['bytes'] / wall_time / 1024 ** 2:.1f} MiB/s ({totals['bytes'] / 1024 ** 2:.1f} MiB in {totals['requests']} requests)")
+        peak_rss = get_peak_rss()
+        print(f"peak RSS        {peak_rss / 1024 ** 2:.1f} MiB" if peak_rss else "peak RSS        n/a")
+        print(f"connections     {connection_stats.summary()}")
+        print(f"retries         {retry_stats.summary()}")
+        if error:
+            print(f"failed          {error}")
+    finally:
+        os.chdir(original_dir)
+        server.terminate()
+        if args.keep:
+            print(f"output kept in  {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
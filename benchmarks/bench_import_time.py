@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+HEAVY_MODULES = ('rich', 'colorama', 'ffmpeg', 'requests')
+
+# Modules that must stay out of sys.modules after importing each target.
+# requests is needed by any actual download, so only the package itself and
+# the CLI (for --help and argument errors) have to do without it.
+FORBIDDEN = {
+    'drtv_dl': ('rich', 'colorama', 'ffmpeg', 'requests'),
+    'drtv_dl.cli': ('rich', 'colorama', 'ffmpeg', 'requests'),
+    'drtv_dl.main': ('rich', 'colorama', 'ffmpeg'),
+}
+
+PROBE_SCRIPT = """
+import sys, json, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'modules': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+FFMPEG_SCRIPT = """
+import json, time
+from drtv_dl.utils.helpers import get_ffmpeg_info
+started = time.perf_counter()
+info = get_ffmpeg_info()
+first = time.perf_counter() - started
+started = time.perf_counter()
+for _ in range(1000):
+    get_ffmpeg_info()
+cached = (time.perf_counter() - started) / 1000
+print(json.dumps({'first': first, 'cached': cached, 'version': info['version']}))
+"""
+
+
+def run_python(script):
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time of drtv_dl and check that heavy dependencies stay lazy")
+    parser.add_argument("--repeat", type=int, default=10, help="Fresh interpreters per module; the median is reported")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if the median import of drtv_dl.main takes longer than this")
+    parser.add_argument("--skip-ffmpeg", action="store_true", help="Do not measure the ffmpeg probe")
+    args = parser.parse_args()
+
+    failed = False
+    medians = {}
+    print(f"{'module':<16}{'median ms':>10}{'min ms':>9}  heavy modules loaded")
+    for module, forbidden in FORBIDDEN.items():
+        runs = [run_python(PROBE_SCRIPT.format(module=module, heavy=HEAVY_MODULES)) for _ in range(args.repeat)]
+        times = [run['seconds'] * 1000 for run in runs]
+        loaded = runs[-1]['modules']
+        medians[module] = statistics.median(times)
+        print(f"{module:<16}{medians[module]:>10.1f}{min(times):>9.1f}  {', '.join(loaded) or '-'}")
+        unexpected = [name for name in loaded if name in forbidden]
+        if unexpected:
+            print(f"  FAIL: importing {module} loaded {', '.join(unexpected)}")
+            failed = True
+
+    if args.max_ms is not None and medians['drtv_dl.main'] > args.max_ms:
+        print(f"FAIL: drtv_dl.main took {medians['drtv_dl.main']:.1f} ms, budget is {args.max_ms:g} ms")
+        failed = True
+
+    if not args.skip_ffmpeg:
+        try:
+            probe = run_python(FFMPEG_SCRIPT)
+        except subprocess.CalledProcessError:
+            print("ffmpeg probe      not available")
+        else:
+            print(f"ffmpeg probe      first {probe['first'] * 1000:.1f} ms, cached {probe['cached'] * 1e6:.2f} us ({probe['version']})")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drtv_dl.utils.m3u8_parser import M3U8Parser
+
+BASE_URI = 'https://drod.example.invalid/hls/master.m3u8'
+
+
+def build_master_playlist(variants, renditions):
+    lines = ['#EXTM3U', '#EXT-X-INDEPENDENT-SEGMENTS']
+    for index in range(renditions):
+        lines.append(f'#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac-{index % 4}",NAME="Audio {index}",LANGUAGE="da",'
+                     f'AUTOSELECT=YES,DEFAULT=NO,CHANNELS="2",URI="audio/{index}/playlist.m3u8"')
+        lines.append(f'#EXT-X-MEDIA:TYPE=SUBTITLES,GROUP-ID="subs",NAME="Subtitles {index}",LANGUAGE="da",'
+                     f'AUTOSELECT=YES,URI="subs/{index}/playlist.m3u8"')
+    for index in range(variants):
+        height = (360, 540, 720, 1080)[index % 4]
+        lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={500000 + index * 1000},AVERAGE-BANDWIDTH={450000 + index * 1000},'
+                     f'CODECS="avc1.640028,mp4a.40.2",RESOLUTION={height * 16 // 9}x{height},FRAME-RATE=25.000,'
+                     f'AUDIO="aac-{index % 4}",SUBTITLES="subs"')
+        lines.append(f'video/{index}/playlist.m3u8')
+    return '\n'.join(lines)
+
+def build_media_playlist(segments):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:7', '#EXT-X-TARGETDURATION:6', '#EXT-X-MAP:URI="track.mp4",BYTERANGE="800@0"']
+    offset = 800
+    for _ in range(segments):
+        lines.append('#EXTINF:6.000,')
+        lines.append(f'#EXT-X-BYTERANGE:250000@{offset}')
+        lines.append('track.mp4')
+        offset += 250000
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines)
+
+def measure(name, func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed / repeat * 1000:9.3f} ms/playlist  {repeat / elapsed:10.1f} playlists/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark for M3U8Parser on synthetic playlists")
+    parser.add_argument("--variants", type=int, default=2000, help="Video variants in the master playlist")
+    parser.add_argument("--renditions", type=int, default=200, help="Audio and subtitle renditions in the master playlist")
+    parser.add_argument("--segments", type=int, default=20000, help="Segments in the media playlist")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of times each playlist is parsed")
+    args = parser.parse_args()
+
+    master = build_master_playlist(args.variants, args.renditions)
+    media = build_media_playlist(args.segments)
+    print(f"master playlist: {len(master) / 1024:.0f} KiB, media playlist: {len(media) / 1024:.0f} KiB")
+
+    measure("parse_records (master)", lambda: M3U8Parser(BASE_URI, master).parse_records(), args.repeat)
+    measure("parse (master, dict view)", lambda: M3U8Parser(BASE_URI, master).parse(), args.repeat)
+    measure("extract_map_uri (media)", lambda: M3U8Parser.extract_map_uri(media, BASE_URI), args.repeat)
+    measure("extract_segments (media)", lambda: M3U8Parser.extract_segments(media, BASE_URI), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_end_to_end import build_fixtures
+from drtv_dl.utils import settings
+from drtv_dl.utils.merger import Merger
+
+
+def get_cpu_time():
+    if resource is None:
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+def prepare_tracks(fixtures_dir, layout, work_dir):
+    if layout == 'file':
+        return os.path.join(fixtures_dir, 'video.mp4'), os.path.join(fixtures_dir, 'audio.mp4')
+    # The segment layout is what SegmentDownloader leaves on disk: the init
+    # segment followed by every media segment.
+    tracks = []
+    for stream_type in ('video', 'audio'):
+        filename = os.path.join(work_dir, f'{stream_type}.track')
+        segments = sorted(
+            (name for name in os.listdir(fixtures_dir) if name.startswith(f'{stream_type}-') and name.endswith('.m4s')),
+            key=lambda name: int(name[len(stream_type) + 1:-4])
+        )
+        with open(filename, 'wb') as output:
+            for name in [f'{stream_type}-init.mp4'] + segments:
+                with open(os.path.join(fixtures_dir, name), 'rb') as segment:
+                    shutil.copyfileobj(segment, output)
+        tracks.append(filename)
+    return tracks
+
+def measure(muxer, video, audio, output, repeat):
+    settings.set_muxer(muxer)
+    walls, cpus = [], []
+    for _ in range(repeat):
+        cpu_started = get_cpu_time()
+        started = time.perf_counter()
+        Merger(video, audio, None, output, cfmt='mp4')._merge_streams()
+        walls.append(time.perf_counter() - started)
+        cpus.append(get_cpu_time() - cpu_started)
+    return min(walls), sum(cpus) / len(cpus)
+
+def get_packet_hashes(filename):
+    result = subprocess.run(
+        ['ffmpeg', '-v', 'error', '-i', filename, '-map', '0', '-c', 'copy', '-f', 'framemd5', '-'],
+        capture_output=True, text=True, check=True
+    )
+    return [line for line in result.stdout.splitlines() if not line.startswith('#')]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the built-in MP4 muxer with ffmpeg stream copy on generated fMP4 tracks")
+    parser.add_argument("--duration", type=int, default=30, help="Length of the fixture media in seconds")
+    parser.add_argument("--layout", choices=["file", "segments"], default="file", help="Tracks as single fMP4 files or as concatenated HLS segments")
+    parser.add_argument("--repeat", type=int, default=5, help="Merges per muxer; the fastest wall time is reported")
+    parser.add_argument("--fixtures-dir", default=os.path.join(tempfile.gettempdir(), 'drtv-dl-bench-fixtures'), help="Where generated media fixtures are kept between runs")
+    parser.add_argument("--no-verify", action="store_true", help="Skip comparing the packets of both outputs")
+    args = parser.parse_args()
+
+    build_fixtures(args.fixtures_dir, args.duration)
+    work_dir = tempfile.mkdtemp(prefix='drtv-dl-bench-')
+    try:
+        video, audio = prepare_tracks(args.fixtures_dir, args.layout, work_dir)
+        size = os.path.getsize(video) + os.path.getsize(audio)
+        print(f"{size / 1024 ** 2:.1f} MiB of tracks, layout={args.layout}, best of {args.repeat}")
+        outputs = {}
+        for muxer in ('ffmpeg', 'native'):
+            outputs[muxer] = os.path.join(work_dir, f'{muxer}.mp4')
+            wall, cpu = measure(muxer, video, audio, outputs[muxer], args.repeat)
+            print(f"{muxer:<8} {wall * 1000:8.1f} ms  {size / wall / 1024 ** 2:8.1f} MiB/s  {cpu * 1000:8.1f} ms CPU (including child processes)")
+        if not args.no_verify:
+            identical = get_packet_hashes(outputs['ffmpeg']) == get_packet_hashes(outputs['native'])
+            print(f"packets  {'identical' if identical else 'DIFFERENT'}")
+            if not identical:
+                sys.exit(1)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drtv_dl.utils import settings
+from drtv_dl.utils.file_downloader import FileDownloader
+
+
+class LegacyFileDownloader(FileDownloader):
+    # The write path before buffered reads: a new 8 KiB bytes object per chunk.
+    def _iter_chunks(self, response, limit=None):
+        for chunk in response.iter_content(chunk_size=8192):
+            yield chunk if limit is None else chunk[:limit]
+            if limit is not None:
+                limit -= len(chunk)
+                if limit <= 0:
+                    return
+
+    def _preallocate(self, file):
+        pass
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for_server(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("Benchmark server did not start")
+
+def measure(downloader_class, url, work_dir, size, repeat):
+    results = []
+    for attempt in range(repeat):
+        filename = os.path.join(work_dir, f"{downloader_class.__name__}.{attempt}")
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        downloader_class(url, filename).download()
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        os.remove(filename)
+        results.append((size / wall, cpu / size * 1024 ** 3))
+    return max(rate for rate, _ in results), min(cpu for _, cpu in results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the legacy and buffered download write paths against a local server")
+    parser.add_argument("--size", type=int, default=512, help="Size of the served file in MiB")
+    parser.add_argument("--repeat", type=int, default=3, help="Downloads per write path; the best run is reported")
+    args = parser.parse_args()
+
+    settings.set_suppress_output(True)
+    settings.set_progress_options(mode='off')
+    settings.set_range_options(parts=1)
+
+    serve_dir = tempfile.mkdtemp(prefix='drtv-dl-bench-serve-')
+    work_dir = tempfile.mkdtemp(prefix='drtv-dl-bench-out-')
+    size = args.size * 1024 * 1024
+    with open(os.path.join(serve_dir, 'track.mp4'), 'wb') as file:
+        for _ in range(args.size):
+            file.write(os.urandom(1024 * 1024))
+
+    # The server runs in its own process so its CPU time is not counted.
+    port = get_free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'http.server', str(port), '--bind', '127.0.0.1', '--directory', serve_dir],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_server(port)
+        url = f'http://127.0.0.1:{port}/track.mp4'
+        print(f"{args.size} MiB file, best of {args.repeat}")
+        for name, downloader_class in (("before (8 KiB iter_content)", LegacyFileDownloader), ("after (buffered readinto)", FileDownloader)):
+            rate, cpu_per_gb = measure(downloader_class, url, work_dir, size, args.repeat)
+            print(f"{name:<30} {rate / 1024 ** 2:8.1f} MiB/s  {cpu_per_gb:6.2f} CPU s/GiB")
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(serve_dir, ignore_errors=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,11 @@
-from drtv_dl.main import download
-
 __version__ = "0.1.1"
-__all__ = ['download', '__version__']
\ No newline at end of file
+__all__ = ['download', '__version__']
+
+
+def __getattr__(name):
+    # drtv_dl.main pulls in requests and the rest of the downloader, so it is
+    # only imported once download is actually used.
+    if name == 'download':
+        from drtv_dl.main import download
+        return download
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,30 +1,101 @@
+import sys
 import argparse
 
 from drtv_dl.logger import logger
-from drtv_dl.main import download
+
+def read_batch_file(path):
+    if path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Download videos from DR TV")
-    parser.add_argument("url", help="URL of the video to download")
+    parser.add_argument("url", nargs="*", help="URLs of the videos, seasons or series to download")
+    parser.add_argument("-a", "--batch-file", default=None, help="File with one URL per line to download in the same run ('-' reads standard input); lines starting with # are ignored")
     parser.add_argument("--resolution", default="1080p", help="Desired video resolution (e.g., 1080p, 720p)")
     parser.add_argument("--include-subs", action="store_true", help="Download with subtitles")
     parser.add_argument("--cfmt", "--container-format", default="mkv", help="Desired container format (e.g., mkv, mp4, mov)")
     parser.add_argument("--ntmpl", help="User-custom naming template i.e. \"{title} E{episode_number} {year} [{id}]\"")
     parser.add_argument("--proxy", default=None,help="Proxy to use for the download")
+    parser.add_argument("--pool-size", type=int, default=None, help="Maximum number of pooled HTTP connections per host")
+    parser.add_argument("--no-keep-alive", action="store_true", help="Close HTTP connections after every request")
+    parser.add_argument("--concurrent-episodes", type=int, default=1, help="Number of episodes to process at the same time")
+    parser.add_argument("--parts", type=int, default=None, help="Number of parallel connections per track, used for ranged parts or HLS segments (1 disables parallel transfers)")
+    parser.add_argument("--min-part-size", default=None, help="Minimum size of each ranged part, e.g. 16M")
+    parser.add_argument("--no-preallocate", action="store_true", help="Do not reserve disk space for a file before downloading it")
+    parser.add_argument("--limit-rate", default=None, help="Maximum total download rate in bytes per second, e.g. 5M; shared fairly between episodes")
+    parser.add_argument("--limit-rate-per-job", default=None, help="Maximum download rate of a single episode in bytes per second, e.g. 2M")
+    parser.add_argument("--retries", type=int, default=None, help="Maximum number of retries for failed requests and interrupted transfers")
+    parser.add_argument("--cache-dir", default=None, help="Directory for cached tokens and metadata")
+    parser.add_argument("--no-token-cache", action="store_true", help="Do not keep the anonymous token on disk between runs")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument("--no-cache", action="store_const", const="off", dest="http_cache", default="use", help="Do not read or write the metadata cache")
+    cache_group.add_argument("--refresh", action="store_const", const="refresh", dest="http_cache", help="Revalidate every cached metadata response with the server")
+    parser.add_argument("--download-archive", default=None, help="SQLite file recording downloaded items; recorded items are skipped")
+    parser.add_argument("--sync", action="store_true", help="Only download episodes of the given seasons and series that are new or changed since the last sync")
+    parser.add_argument("--sync-state", default=None, help="SQLite file holding the snapshot of every synced season and series (defaults to the cache directory)")
+    parser.add_argument("--watch", type=float, default=None, metavar="INTERVAL", help="Keep syncing, polling every INTERVAL seconds")
+    parser.add_argument("--merge-workers", type=int, default=None, help="Number of episodes merged in the background while the next ones download (0 merges before moving on)")
+    parser.add_argument("--max-pending-merges", type=int, default=None, help="Maximum number of downloaded episodes waiting to be merged before downloads pause")
+    parser.add_argument("--muxer", choices=["ffmpeg", "native"], default="ffmpeg", help="Merge MP4 output without subtitles with the built-in muxer instead of ffmpeg (other outputs always use ffmpeg)")
+    parser.add_argument("--stream-merge", action="store_true", help="Pipe the tracks straight into ffmpeg instead of writing intermediate files")
+    parser.add_argument("--progress", choices=["text", "json", "off"], default="text", help="Progress display: live text lines, JSON lines on stdout, or nothing")
+    parser.add_argument("--progress-interval", type=float, default=None, help="Seconds between progress refreshes")
+    parser.add_argument("--metrics-json", default=None, help="Write per-item phase timings, bytes and request counts to this JSON file")
+    parser.add_argument("--metrics-prometheus", default=None, help="Write the same metrics to this file in the Prometheus textfile format")
+    parser.add_argument("--profile", default=None, help="Profile the whole run with cProfile and write the stats to this file")
     parser.add_argument("--list-formats", action="store_true", help="List available formats")
     parser.add_argument("--suppress-output", action="store_true", help="Suppress output to the screen")
     parser.add_argument("--log-level", default="INFO", help="Set the logging level")
     args = parser.parse_args()
 
+    urls = list(args.url)
+    if args.batch_file:
+        urls += read_batch_file(args.batch_file)
+    if not urls:
+        parser.error("at least one URL or a batch file is required")
+
+    if args.watch is not None and args.watch <= 0:
+        parser.error("--watch INTERVAL must be positive")
+
     logger.setLevel(args.log_level.upper())
-    
+
+    from drtv_dl.main import download
     download(
-        url=args.url, 
+        url=urls[0] if len(urls) == 1 and not args.batch_file else urls, 
         resolution=args.resolution,
         include_subs=args.include_subs,
         cfmt=args.cfmt,
         ntmpl=args.ntmpl,
         proxy=args.proxy,
+        pool_size=args.pool_size,
+        keep_alive=not args.no_keep_alive,
+        concurrent_episodes=args.concurrent_episodes,
+        parts=args.parts,
+        min_part_size=args.min_part_size,
+        retries=args.retries,
+        preallocate=not args.no_preallocate,
+        limit_rate=args.limit_rate,
+        limit_rate_per_job=args.limit_rate_per_job,
+        cache_dir=args.cache_dir,
+        token_cache=not args.no_token_cache,
+        http_cache=args.http_cache,
+        download_archive=args.download_archive,
+        sync=args.sync,
+        sync_state=args.sync_state,
+        watch=args.watch,
+        stream_merge=args.stream_merge,
+        merge_workers=args.merge_workers,
+        muxer=args.muxer,
+        max_pending_merges=args.max_pending_merges,
+        progress=args.progress,
+        progress_interval=args.progress_interval,
+        metrics_json=args.metrics_json,
+        metrics_prometheus=args.metrics_prometheus,
+        profile=args.profile,
         list_formats=args.list_formats,
         suppress_output=args.suppress_output
     )
@@ -1,11 +1,20 @@
 import os
-import requests
+import time
+import errno
+import tempfile
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
 
 from drtv_dl.logger import logger
 from drtv_dl.utils.merger import Merger
-from drtv_dl.utils import settings
+from drtv_dl.utils.metrics import metrics
+from drtv_dl.utils.retry import wait_for_transfers
 from drtv_dl.utils.m3u8_parser import M3U8Parser
 from drtv_dl.utils.progress_tracker import ProgressTracker
+from drtv_dl.utils.bandwidth import bandwidth_scheduler
+from drtv_dl.utils.file_downloader import FileDownloader
+from drtv_dl.utils.segment_downloader import SegmentDownloader
 from drtv_dl.utils.helpers import (
     generate_filename,
     download_webpage,
@@ -14,6 +23,7 @@ from drtv_dl.utils.helpers import (
     print_formats,
     print_to_screen,
     delete_files,
+    get_ffmpeg_info,
 )
 from drtv_dl.exceptions import (
     DownloadError,
@@ -21,8 +31,22 @@ from drtv_dl.exceptions import (
 )
 
 class DRTVDownloader:
-    def download(self, info, list_formats, resolution, include_subs, ntmpl, cfmt):
+    MANIFEST_CACHE_TTL = 10 * 60
+
+    def __init__(self, merge_queue=None):
+        self.merge_queue = merge_queue
+
+    def download(self, info, list_formats, resolution, include_subs, ntmpl, cfmt, stream_merge=False, on_merged=None, overwrite=False):
+        # on_merged(output_filename, error) is called once the output file
+        # exists. Merges in the foreground raise instead of reporting an
+        # error; merges on the queue report it through the callback.
         base_filename = generate_filename(info, ntmpl)
+        output_filename = f"{base_filename}.{cfmt}"
+
+        if not list_formats and not overwrite and self._check_if_downloaded(output_filename):
+            if on_merged:
+                on_merged(output_filename, None)
+            return output_filename
 
         stream_url = get_optimal_format(info.get('formats', [])).get('url')
         m3u8_streams = self._download_m3u8_manifest(stream_url)
@@ -30,72 +54,190 @@ class DRTVDownloader:
 
         if list_formats:
             print_formats(parsed_m3u8_streams)
-            return
-
-        if self._check_if_downloaded(base_filename):
-            return
+            return None
 
         optimal_stream = get_optimal_stream(parsed_m3u8_streams, resolution, include_subs)
-        video_filename = self._download_stream(optimal_stream['video'], base_filename, stream_type='video')
-        audio_filename = self._download_stream(optimal_stream['audio'], base_filename, stream_type='audio')
+        # Every remaining path ends in a merge, so a missing ffmpeg is
+        # reported before any track is downloaded.
+        get_ffmpeg_info()
+        if stream_merge and hasattr(os, 'mkfifo'):
+            self._download_and_merge_streaming(info, optimal_stream, base_filename, include_subs, cfmt)
+            if on_merged:
+                on_merged(output_filename, None)
+            return output_filename
+        if stream_merge:
+            print_to_screen("Streaming merge needs named pipes, which this platform lacks - using intermediate files", level='warning')
+
+        video_filename, audio_filename, subtitle_filename = self._download_tracks(optimal_stream, base_filename, include_subs)
+
+        if self.merge_queue is not None:
+            self.merge_queue.submit(
+                self._merge_and_cleanup, info, video_filename, audio_filename, subtitle_filename, base_filename, cfmt,
+                callback=functools.partial(on_merged, output_filename) if on_merged else None
+            )
+            return output_filename
+
+        self._merge_and_cleanup(info, video_filename, audio_filename, subtitle_filename, base_filename, cfmt)
+        if on_merged:
+            on_merged(output_filename, None)
+        return output_filename
+
+    @classmethod
+    def _merge_and_cleanup(cls, info, video_filename, audio_filename, subtitle_filename, base_filename, cfmt):
+        cls._merge_streams(info, video_filename, audio_filename, subtitle_filename, base_filename, cfmt)
+        cls._cleanup(video_filename, audio_filename, subtitle_filename)
+
+    def _download_tracks(self, optimal_stream, base_filename, include_subs):
+        # The tracks share one abort event, so the first one to fail stops the
+        # others instead of waiting for the whole video to finish.
+        progress_tracker = ProgressTracker(0, base_filename)
+        abort = threading.Event()
+        try:
+            with bandwidth_scheduler.open_job() as throttle, ThreadPoolExecutor(max_workers=3) as executor:
+                futures = [
+                    executor.submit(metrics.bind(self._download_stream), optimal_stream['video'], base_filename, 'video', progress_tracker, throttle, abort),
+                    executor.submit(metrics.bind(self._download_stream), optimal_stream['audio'], base_filename, 'audio', progress_tracker, throttle, abort),
+                    executor.submit(metrics.bind(self._download_subtitle), optimal_stream, base_filename, include_subs, progress_tracker, throttle, abort),
+                ]
+                return tuple(wait_for_transfers(futures, abort))
+        finally:
+            progress_tracker.finish()
+
+    @metrics.timed('stream_merge')
+    def _download_and_merge_streaming(self, info, optimal_stream, base_filename, include_subs, cfmt):
+        output_filename = f"{base_filename}.{cfmt}"
         subtitle_filename = self._download_subtitle(optimal_stream, base_filename, include_subs)
+        sources = {
+            stream_type: self._get_track_source(optimal_stream[stream_type], stream_type)
+            for stream_type in ('video', 'audio')
+        }
+
+        fifo_dir = tempfile.mkdtemp(prefix='drtv-dl-')
+        fifos = {stream_type: os.path.join(fifo_dir, stream_type) for stream_type in sources}
+        for fifo in fifos.values():
+            os.mkfifo(fifo)
+
+        merger = Merger(
+            fifos['video'],
+            fifos['audio'],
+            subtitle_filename,
+            output_filename,
+            cfmt=cfmt
+        )
+        progress_tracker = ProgressTracker(0, base_filename)
+        throttle = bandwidth_scheduler.open_job()
+        abort = threading.Event()
+        process = None
+        try:
+            process = merger.start(note=f"{info['id']}: Streaming tracks into {output_filename}")
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                futures = [
+                    executor.submit(metrics.bind(self._stream_to_fifo), sources[stream_type], fifos[stream_type], process, progress_tracker, throttle, abort)
+                    for stream_type in ('video', 'audio')
+                ]
+                try:
+                    wait_for_transfers(futures, abort)
+                except Exception:
+                    # A writer that lost its pipe only reports a broken pipe,
+                    # while ffmpeg's own error explains why it stopped reading.
+                    if process.poll() not in (None, 0):
+                        merger.wait(process)
+                    raise
+                merger.wait(process)
+            merger.commit()
+        except BaseException:
+            if process is not None and process.poll() is None:
+                process.kill()
+                process.wait()
+            merger.discard()
+            raise
+        finally:
+            throttle.close()
+            progress_tracker.finish()
+            delete_files(*fifos.values())
+            os.rmdir(fifo_dir)
+
+        self._cleanup(None, None, subtitle_filename)
 
-        self._merge_streams(info, video_filename, audio_filename, subtitle_filename, base_filename, cfmt)
-        self._cleanup(video_filename, audio_filename, subtitle_filename)
+    @classmethod
+    def _stream_to_fifo(cls, source, fifo, process, progress_tracker, throttle=None, abort=None):
+        # Opening a FIFO for writing blocks until ffmpeg opens it for reading,
+        # which never happens if ffmpeg fails first, so poll without blocking.
+        while True:
+            try:
+                fd = os.open(fifo, os.O_WRONLY | os.O_NONBLOCK)
+                break
+            except OSError as e:
+                if e.errno != errno.ENXIO:
+                    raise
+                if process.poll() is not None:
+                    raise MergeError("ffmpeg exited before reading all streams")
+                time.sleep(0.05)
+        os.set_blocking(fd, True)
+        cls._get_track_downloader(source, fifo, progress_tracker, throttle, abort).download_to_pipe(os.fdopen(fd, 'wb'))
 
-    def _download_stream(self, stream, base_filename, stream_type):
+    def _download_stream(self, stream, base_filename, stream_type, progress_tracker=None, throttle=None, abort=None):
+        filename = f"{base_filename}.{stream_type}"
+        # The downloader reuses a finished file only if it came from the
+        # same source, so the track playlist is always fetched.
+        with metrics.phase(stream_type):
+            source = self._get_track_source(stream, stream_type)
+            self._get_track_downloader(source, filename, progress_tracker, throttle, abort).download()
+        print_to_screen(f"{stream_type.capitalize()} saved as {filename}")
+        return filename
+
+    @staticmethod
+    def _get_track_source(stream, stream_type):
+        # A track is either one file referenced by EXT-X-MAP (possibly split
+        # into byte ranges of that same file) or a list of media segments.
         m3u8 = download_webpage(url=stream['uri'])
         map_uri = M3U8Parser.extract_map_uri(m3u8, stream['uri'])
-        if map_uri:
-            filename = f"{base_filename}.{stream_type}"
-            self._download_file(map_uri, filename, note=f"{stream_type.capitalize()} saved as {filename}")
-            return filename
-        else:
-            logger.error(f"Could not find {stream_type} MAP URI")
-            raise DownloadError(f"Could not find {stream_type} MAP URI")
-
-    def _download_subtitle(self, optimal_stream, base_filename, include_subs):
+        segments = M3U8Parser.extract_segments(m3u8, stream['uri'])
+        if map_uri and all(segment['uri'] == map_uri for segment in segments):
+            return map_uri
+        if not segments:
+            logger.error(f"Could not find {stream_type} MAP URI or media segments")
+            raise DownloadError(f"Could not find {stream_type} MAP URI or media segments")
+        logger.debug(f"Found {len(segments)} {stream_type} segments")
+        return segments
+
+    @staticmethod
+    def _get_track_downloader(source, filename, progress_tracker=None, throttle=None, abort=None):
+        if isinstance(source, str):
+            return FileDownloader(source, filename, progress_tracker, throttle, abort)
+        return SegmentDownloader(source, filename, progress_tracker, throttle, abort)
+
+    def _download_subtitle(self, optimal_stream, base_filename, include_subs, progress_tracker=None, throttle=None, abort=None):
         if include_subs and optimal_stream['subtitle']:
             subtitle_url = optimal_stream['subtitle']['uri']
             vtt_filename = f"{base_filename}.vtt"
             self._download_file(subtitle_url, vtt_filename,
-                        note=f"Subtitles saved as {vtt_filename}")
+                        note=f"Subtitles saved as {vtt_filename}",
+                        progress_tracker=progress_tracker, throttle=throttle, abort=abort)
             return vtt_filename
 
         return None
 
-    @staticmethod
-    def _download_m3u8_manifest(stream_url):
+    @classmethod
+    @metrics.timed('manifest')
+    def _download_m3u8_manifest(cls, stream_url):
         print_to_screen("Downloading m3u8 manifest...")
         return download_webpage(
-            url=stream_url
+            url=stream_url,
+            cache_ttl=cls.MANIFEST_CACHE_TTL
         )
 
     @staticmethod
-    def _check_if_downloaded(base_filename):
-        if os.path.exists(base_filename + ".mp4"):
-            print_to_screen(f"{base_filename} is already downloaded")
+    def _check_if_downloaded(output_filename):
+        if os.path.exists(output_filename):
+            print_to_screen(f"{output_filename} is already downloaded")
             return True
         return False
 
     @staticmethod
-    def _download_file(url, filename, note):
-        response = requests.get(url, stream=True, proxies=settings.PROXY)
-        response.raise_for_status()
-
-        initial_size = response.headers.get('content-length', "?")
-        if initial_size == "?":
-            print_to_screen(f"Could not get content length - setting to '?'", level='warning')
-        progress_tracker = ProgressTracker(initial_size, filename)
-
-        print_to_screen(f"Destination: {filename}")
-        with open(filename, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                size = file.write(chunk)
-                progress_tracker.update(size)
-
-        progress_tracker.finish()
-
+    @metrics.timed('subtitles')
+    def _download_file(url, filename, note, progress_tracker=None, throttle=None, abort=None):
+        FileDownloader(url, filename, progress_tracker, throttle, abort).download()
         print_to_screen(note)
 
     @staticmethod
@@ -116,5 +258,6 @@ class DRTVDownloader:
         delete_files(
             video_filename,
             audio_filename,
-            subtitle_filename
+            subtitle_filename,
+            *[f"{filename}.part.json" for filename in (video_filename, audio_filename, subtitle_filename) if filename]
         )
@@ -59,3 +59,15 @@ class ContainerNotSupportedError(DRTVDLException):
 class FFmpegNotAccessibleError(DRTVDLException):
     """Raised when FFmpeg is not installed or not accessible."""
     pass
+
+class TransferInterruptedError(DownloadError):
+    """Raised when a transfer ends before all expected bytes were received."""
+    pass
+
+class TransferCancelledError(DownloadError):
+    """Raised when a transfer is stopped because a related transfer failed."""
+    pass
+
+class RemuxNotSupportedError(MergeError):
+    """Raised when the built-in muxer cannot handle the input tracks."""
+    pass
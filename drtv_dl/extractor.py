@@ -2,11 +2,17 @@
 
 import uuid
 import json
-import requests
+import threading
+from requests.exceptions import HTTPError
 from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
 
 from drtv_dl.utils import settings
 from drtv_dl.logger import logger
+from drtv_dl.utils.session import get_session
+from drtv_dl.utils.retry import with_retries
+from drtv_dl.utils.metrics import metrics
+from drtv_dl.utils.token_cache import TokenCache, token_cache
 from drtv_dl.exceptions import (
     TokenRetrievalError, 
     ItemIDExtractionError, 
@@ -38,9 +44,49 @@ class InfoExtractor:
         'supportFallbackToken': 'true',
     }
 
+    TOKEN_TYPE = 'UserAccount'
+    ITEM_CACHE_TTL = 6 * 3600
+    STREAM_CACHE_TTL = 10 * 60
+
     def __init__(self):
+        self._token_lock = threading.Lock()
+        self._TOKEN = token_cache.get(self.TOKEN_TYPE)
+        if self._TOKEN:
+            logger.debug("Using cached anonymous token")
+        else:
+            self._TOKEN = self._obtain_token()
+
+    @metrics.timed('token')
+    def _obtain_token(self):
         print_to_screen("Obtaining anonymous token")
-        anon_token_response = requests.post(
+        anon_token_json = with_retries(self._request_anonymous_token, description="Anonymous token request failed")
+        token_entry = next((entry for entry in anon_token_json if entry['type'] == self.TOKEN_TYPE), None)
+        if not token_entry or not token_entry.get('value'):
+            raise TokenRetrievalError("Couldn't retrieve anonymous token")
+        token_cache.store(self.TOKEN_TYPE, token_entry['value'], TokenCache.get_expiry(token_entry))
+        return token_entry['value']
+
+    def _refresh_token(self, rejected_token):
+        with self._token_lock:
+            # Another thread may already have replaced the rejected token.
+            if self._TOKEN == rejected_token:
+                print_to_screen("Anonymous token was rejected - obtaining a new one", level='warning')
+                token_cache.invalidate(self.TOKEN_TYPE, rejected_token)
+                self._TOKEN = self._obtain_token()
+            return self._TOKEN
+
+    def _download_api_json(self, url, params, cache_ttl=None):
+        token = self._TOKEN
+        try:
+            return json.loads(download_webpage(url, params=params, headers={'Authorization': f'Bearer {token}'}, cache_ttl=cache_ttl))
+        except HTTPError as e:
+            if e.response is None or e.response.status_code != 401:
+                raise
+        token = self._refresh_token(token)
+        return json.loads(download_webpage(url, params=params, headers={'Authorization': f'Bearer {token}'}, cache_ttl=cache_ttl))
+
+    def _request_anonymous_token(self):
+        anon_token_response = get_session().post(
             url=self.ANONYMOUS_SSO_URL,
             params=self.ANONYMOUS_SSO_PARAMS,
             headers={'Content-Type': 'application/json'},
@@ -49,14 +95,13 @@ class InfoExtractor:
                 'scopes': ['Catalog'],
                 'optout': True,
             },
-            proxies=settings.PROXY
+            proxies=settings.PROXY,
+            timeout=settings.TIMEOUT
         )
         anon_token_response.raise_for_status()
-        anon_token_json = anon_token_response.json()
-        self._TOKEN = next((entry['value'] for entry in anon_token_json if entry['type'] == 'UserAccount'), None)
-        if not self._TOKEN:
-            raise TokenRetrievalError("Couldn't retrieve anonymous token")
+        return anon_token_response.json()
 
+    @metrics.timed('metadata')
     def extract(self, url):
         _, item_id = extract_ids_from_url(url)
         print_to_screen(f"Extracting information from: {item_id}")
@@ -64,16 +109,16 @@ class InfoExtractor:
             raise ItemIDExtractionError("Could not extract item ID from URL")
 
         print_to_screen(f"{item_id}: Downloading item JSON metadata")
-        item = json.loads(download_webpage(
+        item = self._download_api_json(
             self.ITEM_API_URL.format(item_id),
             params=self.ITEM_DATA_PARAMS,
-            headers={'Authorization': f'Bearer {self._TOKEN}'}
-        ))
+            cache_ttl=self.ITEM_CACHE_TTL
+        )
 
         video_id = item.get('customId', '').split(':')[-1] or item_id
 
         print_to_screen(f"{video_id}: Fetching stream data...")
-        stream_data = json.loads(download_webpage(
+        stream_data = self._download_api_json(
             self.STREAM_API_URL.format(item_id),
             params={
                 'delivery': 'stream',
@@ -83,8 +128,8 @@ class InfoExtractor:
                 'resolution': 'HD-1080',
                 'sub': 'Anonymous',
             },
-            headers={'Authorization': f'Bearer {self._TOKEN}'}
-        ))
+            cache_ttl=self.STREAM_CACHE_TTL
+        )
 
         logger.debug(f"{video_id}: Parsing available formats")
         formats = []
@@ -121,8 +166,26 @@ class InfoExtractor:
         }
 
 
+def _iter_list_items(item_list, api_base_url, cache_ttl, description):
+    # Long lists only carry their first page; the rest is fetched from the
+    # list's next link as the caller gets to it.
+    page = 1
+    while True:
+        yield from item_list.get('items', [])
+        next_path = item_list.get('paging', {}).get('next')
+        if not next_path:
+            return
+        page += 1
+        print_to_screen(f"{description}: Downloading page {page}")
+        item_list = json.loads(download_webpage(
+            url=urljoin(api_base_url, next_path.lstrip('/')),
+            cache_ttl=cache_ttl
+        ))
+
+
 class SeasonInfoExtractor:
     BASE_URL = "https://www.dr.dk/drtv"
+    API_BASE_URL = 'https://production-cdn.dr-massive.com/api/'
     SEASON_API_URL = 'https://production-cdn.dr-massive.com/api/page'
     SEASON_API_PARAMS = {
         'device': 'web_browser',
@@ -131,10 +194,26 @@ class SeasonInfoExtractor:
         'max_list_prefetch': '3',
     }
 
+    SEASON_CACHE_TTL = 3600
+
     def __init__(self, ie):
         self.info_extractor = ie
 
     def extract(self, url):
+        season_id, season_data = self.fetch_season(url)
+        episodes = list(self.iter_season_episodes(url, season_id, season_data))
+        return {
+            'season_number': season_data.get('entries', [])[0].get('item', {}).get('seasonNumber'),
+            'season_id': season_id,
+            'episode_urls': [episode['url'] for episode in episodes],
+            'episodes': episodes
+        }
+
+    def iter_episodes(self, url):
+        season_id, season_data = self.fetch_season(url)
+        yield from self.iter_season_episodes(url, season_id, season_data)
+
+    def fetch_season(self, url):
         display_id, season_id = extract_ids_from_url(url)
         print_to_screen(f"Extracting season information from: {display_id}_{season_id}")
         if not season_id:
@@ -148,25 +227,37 @@ class SeasonInfoExtractor:
                 **self.SEASON_API_PARAMS,
                 'path': f'/saeson/{display_id}_{season_id}'
             },
+            cache_ttl=self.SEASON_CACHE_TTL
         ))
+        return season_id, season_data
 
-        episodes = season_data.get('entries', [])[0].get('item', {}).get('episodes', {}).get('items', [])
-        episode_urls = []
-        for episode in episodes:
-            episode_path = episode.get('path')
-            episode_url = urljoin(self.BASE_URL, episode_path)
-            episode_urls.append(episode_url)
-
-        season_number = season_data.get('entries', [])[0].get('item', {}).get('seasonNumber')
+    def iter_season_episodes(self, url, season_id, season_data):
+        season = season_data.get('entries', [])[0].get('item', {})
+        season_number = season.get('seasonNumber')
+        episodes = _iter_list_items(season.get('episodes', {}), self.API_BASE_URL, self.SEASON_CACHE_TTL, season_id)
+        index = 0
+        for index, episode in enumerate(episodes, start=1):
+            episode_url = urljoin(self.BASE_URL, episode.get('path'))
+            yield {
+                'id': extract_ids_from_url(episode_url)[1],
+                'url': episode_url,
+                'index': index,
+                'validator': self._get_validator(episode),
+                'season_id': season_id,
+                'season_url': url,
+                'season_number': season_number,
+            }
+        print_to_screen(f"Found {index} episodes in season {season_number}")
 
-        print_to_screen(f"Found {len(episode_urls)} episodes in season {season_number}")
-        return {
-            'season_number': season_number,
-            'episode_urls': episode_urls
-        }
+    @staticmethod
+    def _get_validator(episode):
+        # Only the video an episode points at counts as a change; availability
+        # dates, images and other listing fields change without new media.
+        return episode.get('customId') or episode.get('path')
  
 class SeriesInfoExtractor:
     BASE_URL = "https://www.dr.dk/drtv"
+    API_BASE_URL = 'https://production-cdn.dr-massive.com/api/'
     SERIES_API_URL = 'https://production-cdn.dr-massive.com/api/page'
     SERIES_API_PARAMS = {
         'device': 'web_browser',
@@ -175,10 +266,57 @@ class SeriesInfoExtractor:
         'max_list_prefetch': '3',
     }
 
-    def __init__(self, sie):
+    SERIES_CACHE_TTL = 3600
+    MAX_SEASON_WORKERS = 4
+
+    def __init__(self, sie, max_workers=None):
         self.season_extractor = sie
+        self.max_workers = max_workers or self.MAX_SEASON_WORKERS
 
     def extract(self, url):
+        season_urls = self._get_season_urls(url)
+        season_info = []
+        with ThreadPoolExecutor(max_workers=max(min(self.max_workers, len(season_urls)), 1)) as executor:
+            futures = [executor.submit(self._extract_season, season_url) for season_url in season_urls]
+            for season_idx, (season_url, future) in enumerate(zip(season_urls, futures), start=1):
+                try:
+                    season_info.append(future.result())
+                except Exception as e:
+                    print_to_screen(f"Failed to extract season {season_idx} ({season_url}): {e}", level='error')
+                    season_info.append({
+                        'season_number': None,
+                        'season_id': extract_ids_from_url(season_url)[1],
+                        'season_url': season_url,
+                        'episode_urls': [],
+                        'episodes': [],
+                        'error': e,
+                    })
+
+        print_to_screen(f"Total seasons found: {len(season_info)}")
+        return season_info
+
+    def iter_episodes(self, url, on_season_error=None):
+        # Episodes are yielded season by season as soon as their page is in,
+        # while the first pages of the following seasons are fetched ahead.
+        season_urls = self._get_season_urls(url)
+        print_to_screen(f"Total seasons found: {len(season_urls)}")
+        executor = ThreadPoolExecutor(max_workers=max(min(self.max_workers, len(season_urls)), 1))
+        try:
+            futures = [executor.submit(self._fetch_season, season_url) for season_url in season_urls]
+            for season_idx, (season_url, future) in enumerate(zip(season_urls, futures), start=1):
+                try:
+                    season_id, season_data = future.result()
+                    for episode in self.season_extractor.iter_season_episodes(season_url, season_id, season_data):
+                        yield {**episode, 'season_index': season_idx}
+                except Exception as e:
+                    if on_season_error is None:
+                        raise
+                    print_to_screen(f"Failed to extract season {season_idx} ({season_url}): {e}", level='error')
+                    on_season_error(season_idx, season_url, e)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_season_urls(self, url):
         display_id, series_id = extract_ids_from_url(url)
         print_to_screen(f"Extracting series information from: {display_id}_{series_id}")
         if not series_id:
@@ -192,16 +330,19 @@ class SeriesInfoExtractor:
                 **self.SERIES_API_PARAMS,
                 'path': f'/serie/{display_id}_{series_id}'
             },
+            cache_ttl=self.SERIES_CACHE_TTL
         ))
 
-        seasons = series_data.get('entries', [])[0].get('item', {}).get('show', {}).get('seasons', {}).get('items', [])
-        season_info = []
-        for season in seasons:
-            season_path = season.get('path')
-            season_url = urljoin(self.BASE_URL, season_path)
-            print_to_screen(f"Processing season: {season_url}")
-            season = self.season_extractor.extract(season_url)
-            season_info.append(season)
+        seasons = series_data.get('entries', [])[0].get('item', {}).get('show', {}).get('seasons', {})
+        return [
+            urljoin(self.BASE_URL, season.get('path'))
+            for season in _iter_list_items(seasons, self.API_BASE_URL, self.SERIES_CACHE_TTL, series_id)
+        ]
 
-        print_to_screen(f"Total seasons found: {len(season_info)}")
-        return season_info
\ No newline at end of file
+    def _extract_season(self, season_url):
+        print_to_screen(f"Processing season: {season_url}")
+        return self.season_extractor.extract(season_url)
+
+    def _fetch_season(self, season_url):
+        print_to_screen(f"Processing season: {season_url}")
+        return self.season_extractor.fetch_season(season_url)
@@ -1,6 +1,20 @@
+import os
+import time
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
 from drtv_dl.downloader import DRTVDownloader
-from drtv_dl.exceptions import InvalidURLError
-from drtv_dl.utils.settings import set_suppress_output, set_proxy
+from drtv_dl.utils.archive import DownloadArchive
+from drtv_dl.utils.merge_queue import MergeQueue
+from drtv_dl.utils.sync_state import SyncState
+from drtv_dl.exceptions import InvalidURLError, DownloadError
+from drtv_dl.utils import settings
+from drtv_dl.utils.settings import get_cache_dir, set_suppress_output, set_proxy, set_pool_options, set_range_options, set_retry_options, set_cache_options, set_progress_options, set_preallocate, set_rate_limits, set_merge_options, set_muxer
+from drtv_dl.utils.session import connection_stats
+from drtv_dl.utils.retry import retry_stats
+from drtv_dl.utils.metrics import metrics, RunProfiler
+from drtv_dl.utils.http_cache import http_cache as metadata_cache
 from drtv_dl.extractor import (
     InfoExtractor, 
     SeasonInfoExtractor, 
@@ -9,52 +23,327 @@ from drtv_dl.extractor import (
 from drtv_dl.utils.helpers import (
     print_to_screen, 
     is_valid_drtv_url,
-    is_ffmpeg_accessible
+    extract_ids_from_url,
+    parse_size
 )
 
+_seen_items_lock = threading.Lock()
+# Settings that only apply to the download() call that sets them; they are
+# restored when it returns, so they do not leak into later library calls.
+_CALL_SETTINGS = ('CACHE_DIR', 'TOKEN_CACHE', 'HTTP_CACHE', 'MUXER', 'PREALLOCATE', 'RATE_LIMIT', 'JOB_RATE_LIMIT')
 
-def download(url, resolution="1080p", include_subs=False, cfmt="mkv", ntmpl=None, proxy=None, list_formats=False, suppress_output=False):
-    is_ffmpeg_accessible()
 
-    if not is_valid_drtv_url(url):
+def download(url, resolution="1080p", include_subs=False, cfmt="mkv", ntmpl=None, proxy=None, list_formats=False, suppress_output=False, pool_size=None, keep_alive=True, concurrent_episodes=1, parts=None, min_part_size=None, retries=None, cache_dir=None, token_cache=True, http_cache='use', download_archive=None, stream_merge=False, progress='text', progress_interval=None, preallocate=True, limit_rate=None, limit_rate_per_job=None, merge_workers=None, max_pending_merges=None, muxer='ffmpeg', metrics_json=None, metrics_prometheus=None, profile=None, sync=False, sync_state=None, watch=None):
+    # A list of URLs is downloaded as one batch, a single URL as before.
+    batch = not isinstance(url, str)
+    if batch:
+        urls = _dedupe_urls(url)
+        if not urls:
+            raise InvalidURLError("No URLs were given")
+    elif not is_valid_drtv_url(url):
         raise InvalidURLError("URL was not found to be valid")
+    else:
+        urls = [url]
     
     if suppress_output:
         set_suppress_output(suppress_output)
     if proxy:
         set_proxy(proxy)
+    if progress != 'text' or progress_interval:
+        set_progress_options(mode=progress, interval=progress_interval)
+    sync = sync or watch is not None
+    saved_settings = {name: getattr(settings, name) for name in _CALL_SETTINGS}
+    if cache_dir or not token_cache or http_cache != 'use':
+        set_cache_options(cache_dir=cache_dir, token_cache=token_cache, http_cache=http_cache)
+    if retries is not None:
+        set_retry_options(retries=retries)
+    if muxer != 'ffmpeg':
+        set_muxer(muxer)
+    if merge_workers is not None or max_pending_merges is not None:
+        set_merge_options(workers=merge_workers, max_pending=max_pending_merges)
+    if parts or min_part_size:
+        set_range_options(parts=parts, min_part_size=parse_size(min_part_size) if min_part_size else None)
+    if not preallocate:
+        set_preallocate(preallocate)
+    if limit_rate or limit_rate_per_job:
+        set_rate_limits(
+            rate_limit=parse_size(limit_rate) if limit_rate else None,
+            job_rate_limit=parse_size(limit_rate_per_job) if limit_rate_per_job else None
+        )
 
-    print_to_screen(f"Processing URL: {url}")
-    ie = InfoExtractor()
-    sie = SeasonInfoExtractor(ie)
+    # Every episode worker may hold a connection per ranged part of both
+    # tracks plus one for the subtitles, so size the pool to match.
+    required_pool_size = max(concurrent_episodes, 1) * (2 * max(settings.RANGE_PARTS, 1) + 1)
+    if not pool_size and settings.POOL_MAXSIZE < required_pool_size:
+        pool_size = required_pool_size
+    if pool_size or not keep_alive:
+        set_pool_options(pool_size=pool_size, keep_alive=keep_alive)
+
+    _reset_run_stats()
+    profiler = RunProfiler() if profile else None
+    if profiler:
+        profiler.start()
+
+    options = {
+        'list_formats': list_formats,
+        'resolution': resolution,
+        'include_subs': include_subs,
+        'ntmpl': ntmpl,
+        'cfmt': cfmt,
+        'stream_merge': stream_merge,
+    }
+    archive = None
+    state = None
+    failures = []
+    metrics_written = False
+    if sync and settings.HTTP_CACHE == 'use':
+        # Series and season pages must come from the server on every poll,
+        # but unchanged ones are still answered with a cheap 304.
+        set_cache_options(http_cache='refresh')
+    cache_stats = settings.HTTP_CACHE != 'off'
+
+    try:
+        # One extractor, and with it one token, serves every URL of a batch.
+        ie = InfoExtractor()
+        sie = SeasonInfoExtractor(ie)
+        archive = DownloadArchive(download_archive) if download_archive else None
+        if sync:
+            state = SyncState(sync_state or os.path.join(get_cache_dir('sync'), 'sync.sqlite3'))
+
+        if not batch and not sync and _get_url_type(url) == 'item':
+            print_to_screen(f"Processing URL: {url}")
+            print_to_screen("Identified as a single item URL")
+            print_to_screen("Processing a single item")
+            _download_item(ie, DRTVDownloader(), url, options, archive, seen_items=set())
+        else:
+            while True:
+                failures = _download_urls(ie, sie, urls, batch, options, concurrent_episodes, archive, state)
+                if watch is None:
+                    break
+                # A long-running watch reports and exports every poll and
+                # keeps going when some of its downloads fail.
+                _print_run_stats(cache_stats)
+                _report_failures(batch, urls, failures)
+                _write_metrics(metrics_json, metrics_prometheus)
+                metrics_written = True
+                print_to_screen(f"Next poll in {watch:g} seconds")
+                try:
+                    time.sleep(watch)
+                except KeyboardInterrupt:
+                    print_to_screen("Stopped watching")
+                    return
+                _reset_run_stats()
+                metrics_written = False
+    finally:
+        for name, value in saved_settings.items():
+            setattr(settings, name, value)
+        if archive is not None:
+            archive.close()
+        if state is not None:
+            state.close()
+        if profiler:
+            profiler.stop(profile)
+            print_to_screen(f"Profile written to {profile}")
+        if not metrics_written:
+            _write_metrics(metrics_json, metrics_prometheus)
+
+    _print_run_stats(cache_stats)
+    error = _report_failures(batch, urls, failures)
+    if error:
+        raise DownloadError(error)
 
+
+def _reset_run_stats():
+    # Every counter printed in the run summary covers the same run, or the
+    # same poll of a watch.
+    metrics.reset()
+    connection_stats.reset()
+    retry_stats.reset()
+    metadata_cache.reset_stats()
+
+def _print_run_stats(cache_stats):
+    print_to_screen(f"Connection reuse: {connection_stats.summary()}")
+    print_to_screen(f"Retries: {retry_stats.summary()}")
+    print_to_screen(f"Phase timings: {metrics.summary()}")
+    if cache_stats:
+        print_to_screen(f"Metadata cache: {metadata_cache.summary()}")
+
+def _write_metrics(metrics_json, metrics_prometheus):
+    if metrics_json:
+        metrics.write_json(metrics_json)
+    if metrics_prometheus:
+        metrics.write_prometheus(metrics_prometheus)
+
+def _report_failures(batch, urls, failures):
+    if batch:
+        failed_urls = _print_batch_summary(urls, failures)
+        if failed_urls:
+            return f"{failed_urls} of {len(urls)} URL(s) failed to download"
+    elif failures:
+        for label, episode_url, error, _ in failures:
+            print_to_screen(f"Failed {label} ({episode_url}): {error}", level='error')
+        return f"{len(failures)} episode(s) or season(s) failed to download"
+    return None
+
+def _download_urls(ie, sie, urls, batch, options, concurrent_episodes, archive=None, state=None):
+    failures = []
+    jobs = _iter_all_jobs(sie, urls, batch, failures, state)
+    # Episodes are merged in the background while the next ones
+    # download, so the queue is drained before the summary.
+    merge_queue = MergeQueue() if settings.MERGE_WORKERS > 0 and not options['list_formats'] else None
+    merge_failures = []
+    try:
+        failures += _download_episodes(ie, DRTVDownloader(merge_queue), jobs, concurrent_episodes, options, archive, set(), merge_failures)
+    finally:
+        if merge_queue is not None:
+            merge_queue.close()
+    failures += merge_failures
+    if state is not None and not options['list_formats']:
+        state.commit(failures)
+    return failures
+
+def _get_url_type(url):
     if '/drtv/serie/' in url:
+        return 'series'
+    if '/drtv/saeson/' in url:
+        return 'season'
+    return 'item'
+
+def _dedupe_urls(urls):
+    unique_urls = []
+    seen = set()
+    for url in urls:
+        url = url.strip()
+        if not url:
+            continue
+        key = (_get_url_type(url), extract_ids_from_url(url)[1]) if is_valid_drtv_url(url) else url
+        if key in seen:
+            print_to_screen(f"Skipping duplicate URL: {url}")
+            continue
+        seen.add(key)
+        unique_urls.append(url)
+    return unique_urls
+
+def _iter_all_jobs(sie, urls, batch, failures, state=None):
+    for url_idx, url in enumerate(urls, start=1):
+        url_label = f"URL {url_idx} of {len(urls)}" if batch else None
+        try:
+            yield from _iter_jobs(sie, url, failures, url_label, state)
+        except Exception as e:
+            print_to_screen(f"Error in {url}: {e}", level='error')
+            failures.append((url_label or "URL", url, e, url))
+
+def _iter_jobs(sie, url, failures, url_label=None, state=None):
+    # Jobs are handed out while the listing is still being read, so the
+    # first episode starts downloading after a single page request.
+    print_to_screen(f"Processing URL: {url}")
+    if not is_valid_drtv_url(url):
+        raise InvalidURLError("URL was not found to be valid")
+
+    suffix = f" of {url_label}" if url_label else ""
+    url_type = _get_url_type(url)
+    if url_type == 'item':
+        print_to_screen("Identified as a single item URL")
+        yield (url_label or "item", url, url, False)
+        return
+
+    if url_type == 'series':
         print_to_screen("Identified as a series URL")
-        extractor = SeriesInfoExtractor(sie)
-    elif '/drtv/saeson/' in url:
-        print_to_screen("Identified as a season URL")
-        extractor = sie
+
+        def record_season_error(season_idx, season_url, error):
+            failures.append((f"season {season_idx}{suffix}", season_url, error, url))
+
+        episodes = SeriesInfoExtractor(sie).iter_episodes(url, on_season_error=record_season_error)
     else:
-        print_to_screen("Identified as a single item URL")
-        extractor = ie
-
-    info = extractor.extract(url)
-    downloader = DRTVDownloader()
-
-    if isinstance(info, dict) and 'episode_urls' in info:
-        print_to_screen(f"Starting download of season {info.get('season_number', '')}")
-        for idx, episode_url in enumerate(info['episode_urls'], start=1):
-            print_to_screen(f"Processing episode {idx} of {len(info['episode_urls'])}")
-            episode_info = ie.extract(episode_url)
-            downloader.download(episode_info, list_formats, resolution=resolution, include_subs=include_subs, ntmpl=ntmpl, cfmt=cfmt)
-    elif isinstance(info, list):
-        total_seasons = len(info)
-        for season_idx, season in enumerate(info, start=1):
-            print_to_screen(f"Processing season {season_idx} of {total_seasons}")
-            for idx, episode_url in enumerate(season['episode_urls'], start=1):
-                print_to_screen(f"Processing episode {idx} of {len(season['episode_urls'])} in season {season_idx} of {total_seasons}")
-                episode_info = ie.extract(episode_url)
-                downloader.download(episode_info, list_formats, resolution=resolution, include_subs=include_subs, ntmpl=ntmpl, cfmt=cfmt)
+        print_to_screen("Identified as a season URL")
+        episodes = sie.iter_episodes(url)
+
+    if state is not None:
+        episodes = state.diff(url, episodes)
+    for episode in episodes:
+        if 'season_index' in episode:
+            label = f"episode {episode['index']} in season {episode['season_index']}{suffix}"
+        else:
+            label = f"episode {episode['index']}{suffix}"
+        yield (label, episode['url'], url, episode.get('changed', False))
+    if state is not None:
+        print_to_screen(f"Sync of {url}: {state.summary(url)}")
+
+def _print_batch_summary(urls, failures):
+    failures_by_url = {}
+    for failure in failures:
+        failures_by_url.setdefault(failure[3], []).append(failure)
+    print_to_screen(f"Batch summary: {len(urls) - len(failures_by_url)} of {len(urls)} URL(s) downloaded")
+    for url in urls:
+        url_failures = failures_by_url.get(url)
+        if not url_failures:
+            print_to_screen(f"  OK      {url}")
+            continue
+        print_to_screen(f"  FAILED  {url}", level='error')
+        for label, failed_url, error, _ in url_failures:
+            print_to_screen(f"    {label} ({failed_url}): {error}", level='error')
+    return len(failures_by_url)
+
+
+def _download_item(ie, downloader, url, options, archive, label=None, seen_items=None, on_merge_error=None, replace=False):
+    # replace is set for synced episodes that now point at another video,
+    # which are downloaded again over the archive entry and earlier output.
+    if label:
+        print_to_screen(f"Processing {label}")
+    _, item_id = extract_ids_from_url(url)
+    if seen_items is not None:
+        with _seen_items_lock:
+            if item_id in seen_items:
+                print_to_screen(f"{item_id}: Already part of this run - skipping")
+                return
+            seen_items.add(item_id)
+    if archive is not None and not replace and item_id in archive:
+        print_to_screen(f"{item_id}: Already recorded in the download archive - skipping")
+        return
+    with metrics.item(item_id):
+        info = ie.extract(url)
+        downloader.download(info, on_merged=functools.partial(_on_merged, archive, item_id, info, on_merge_error), overwrite=replace, **options)
+
+def _on_merged(archive, item_id, info, on_merge_error, output_filename, error):
+    # Items are only recorded in the archive once their merge has finished.
+    if error is not None:
+        if on_merge_error is None:
+            print_to_screen(f"{item_id}: Merge failed: {error}", level='error')
+        else:
+            on_merge_error(error)
+    elif archive is not None:
+        archive.add(item_id, info['id'], output_filename)
+
+def _get_merge_error_recorder(merge_failures, label, episode_url, source_url):
+    def record(error):
+        print_to_screen(f"Error merging {label}: {error}", level='error')
+        merge_failures.append((label, episode_url, error, source_url))
+    return record
+
+def _download_episodes(ie, downloader, jobs, concurrent_episodes, options, archive=None, seen_items=None, merge_failures=None):
+    # jobs may be a generator that is still reading the listing, so each
+    # job is started as soon as it is yielded.
+    failures = []
+    if concurrent_episodes > 1:
+        print_to_screen(f"Downloading up to {concurrent_episodes} episodes concurrently")
+        with ThreadPoolExecutor(max_workers=concurrent_episodes) as executor:
+            submitted = []
+            for label, episode_url, source_url, replace in jobs:
+                recorder = _get_merge_error_recorder(merge_failures, label, episode_url, source_url) if merge_failures is not None else None
+                future = executor.submit(_download_item, ie, downloader, episode_url, options, archive, label, seen_items, recorder, replace)
+                submitted.append((label, episode_url, source_url, future))
+            for label, episode_url, source_url, future in submitted:
+                try:
+                    future.result()
+                except Exception as e:
+                    print_to_screen(f"Error in {label}: {e}", level='error')
+                    failures.append((label, episode_url, e, source_url))
     else:
-        print_to_screen("Processing a single item")
-        downloader.download(info, list_formats, resolution=resolution, include_subs=include_subs, ntmpl=ntmpl, cfmt=cfmt)
+        for label, episode_url, source_url, replace in jobs:
+            recorder = _get_merge_error_recorder(merge_failures, label, episode_url, source_url) if merge_failures is not None else None
+            try:
+                _download_item(ie, downloader, episode_url, options, archive, label, seen_items, recorder, replace)
+            except Exception as e:
+                print_to_screen(f"Error in {label}: {e}", level='error')
+                failures.append((label, episode_url, e, source_url))
+    return failures
@@ -0,0 +1,39 @@
+import time
+import sqlite3
+import threading
+
+from drtv_dl.logger import logger
+
+class DownloadArchive:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS downloads ("
+                "item_id TEXT PRIMARY KEY, "
+                "video_id TEXT, "
+                "filename TEXT, "
+                "downloaded_at REAL)"
+            )
+        logger.debug(f"Opened download archive {path}")
+
+    def __contains__(self, item_id):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM downloads WHERE item_id = ?", (str(item_id),)
+            ).fetchone()
+        return row is not None
+
+    def add(self, item_id, video_id=None, filename=None):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO downloads (item_id, video_id, filename, downloaded_at) VALUES (?, ?, ?, ?)",
+                (str(item_id), video_id, filename, time.time())
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
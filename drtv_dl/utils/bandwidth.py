@@ -0,0 +1,78 @@
+import time
+import threading
+
+from drtv_dl.utils import settings
+
+
+class BandwidthThrottle:
+    burst_time = 0.5
+    min_chunk_size = 16 * 1024
+    chunk_time = 0.1
+
+    def __init__(self, scheduler):
+        self._scheduler = scheduler
+        self._lock = threading.Lock()
+        self._available_at = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def rate(self):
+        return self._scheduler.get_share()
+
+    def consume(self, size):
+        # Every transfer of a job reserves its bytes on the same timeline, so
+        # they share the job's rate in the order they read. Idle time builds
+        # up a burst allowance of at most burst_time seconds.
+        rate = self.rate
+        if not rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._available_at = max(self._available_at, now - self.burst_time) + size / rate
+            delay = self._available_at - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def get_chunk_size(self, chunk_size):
+        # Large reads under a low limit would turn into long pauses, so a
+        # chunk is capped to roughly chunk_time seconds of the current rate.
+        rate = self.rate
+        if not rate:
+            return chunk_size
+        return max(min(chunk_size, int(rate * self.chunk_time)), self.min_chunk_size)
+
+    def close(self):
+        self._scheduler.release(self)
+
+
+class BandwidthScheduler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = 0
+
+    def open_job(self):
+        with self._lock:
+            self._jobs += 1
+        return BandwidthThrottle(self)
+
+    def release(self, throttle):
+        with self._lock:
+            self._jobs = max(self._jobs - 1, 0)
+
+    def get_share(self):
+        # The global limit is split evenly between running jobs, and no job
+        # gets more than the per-job limit.
+        share = None
+        if settings.RATE_LIMIT:
+            share = settings.RATE_LIMIT / max(self._jobs, 1)
+        if settings.JOB_RATE_LIMIT:
+            share = min(share, settings.JOB_RATE_LIMIT) if share else settings.JOB_RATE_LIMIT
+        return share
+
+
+bandwidth_scheduler = BandwidthScheduler()
@@ -0,0 +1,413 @@
+import os
+import json
+import errno
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib3.exceptions import (
+    ProtocolError,
+    ReadTimeoutError
+)
+from requests.exceptions import (
+    ChunkedEncodingError,
+    ConnectionError
+)
+
+from drtv_dl.logger import logger
+from drtv_dl.utils import settings
+from drtv_dl.utils.session import get_session
+from drtv_dl.utils.metrics import metrics
+from drtv_dl.utils.progress_tracker import ProgressTracker
+from drtv_dl.utils.helpers import print_to_screen, delete_files, get_source_key
+from drtv_dl.utils.retry import (
+    retry_stats,
+    is_retryable,
+    wait_before_retry,
+    wait_for_transfers,
+    with_retries
+)
+from drtv_dl.exceptions import (
+    DownloadError,
+    TransferInterruptedError,
+    TransferCancelledError
+)
+
+class FileDownloader:
+    min_chunk_size = 64 * 1024
+    max_chunk_size = 4 * 1024 * 1024
+    target_read_time = 0.05
+    state_interval = 2
+
+    def __init__(self, url, filename, progress_tracker=None, throttle=None, abort=None):
+        self.url = url
+        self.source_key = get_source_key(url)
+        self.filename = filename
+        self.throttle = throttle
+        self.part_filename = f"{filename}.part"
+        self.state_filename = f"{filename}.part.json"
+        self.progress_tracker = progress_tracker
+        self.total_size = None
+        self.validator = {}
+        self.parts = []
+        self._state_lock = threading.Lock()
+        self._last_state_save = 0
+        self._discard_state = False
+        # abort may be shared with the other tracks of an episode, so a
+        # failure in any of them stops all of them.
+        self._abort = abort if abort is not None else threading.Event()
+
+    @staticmethod
+    def is_complete(filename, source_key):
+        # A finished file keeps its transfer state, which records where it
+        # came from; a file from another source is downloaded again.
+        if not os.path.exists(filename) or os.path.exists(f"{filename}.part"):
+            return False
+        return FileDownloader.read_state(f"{filename}.part.json").get('source') == source_key
+
+    @staticmethod
+    def read_state(state_filename):
+        try:
+            with open(state_filename, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.debug(f"Ignoring unreadable transfer state {state_filename}: {e}")
+            return {}
+
+    def download(self):
+        if self.is_complete(self.filename, self.source_key):
+            print_to_screen(f"Reusing already downloaded {self.filename}")
+            return
+
+        response = self._request()
+        try:
+            initial_size = self._get_size(response)
+            if initial_size == "?":
+                if not response.headers.get('content-encoding'):
+                    print_to_screen(f"Could not get content length - setting to '?'", level='warning')
+            else:
+                self.total_size = int(initial_size)
+            self.validator = self._get_validator(response)
+
+            resumed = self._load_state()
+            remaining_size = initial_size
+            if resumed:
+                response.close()
+                remaining_size = self.total_size - sum(part[2] for part in self.parts)
+                print_to_screen(f"Resuming {self.filename} at {self.total_size - remaining_size} of {self.total_size} bytes")
+
+            owns_tracker = self.progress_tracker is None
+            if owns_tracker:
+                self.progress_tracker = ProgressTracker(remaining_size, self.filename)
+            else:
+                self.progress_tracker.add_transfer(remaining_size)
+
+            print_to_screen(f"Destination: {self.filename}")
+            try:
+                if self.total_size is None:
+                    self._download_unsized(response)
+                else:
+                    if not resumed:
+                        self.parts = self._plan_parts(response, self.total_size)
+                        with open(self.part_filename, 'wb') as file:
+                            file.truncate(self.total_size)
+                            self._preallocate(file)
+                        self._save_state(force=True)
+                    self._download_parts(None if resumed else response)
+                os.replace(self.part_filename, self.filename)
+                self._save_state(force=True)
+            finally:
+                if owns_tracker:
+                    self.progress_tracker.finish()
+        finally:
+            response.close()
+
+    def download_to_pipe(self, pipe):
+        # Streams the file sequentially into a pipe that ffmpeg reads from.
+        # Nothing reaches the disk, so an interrupted transfer can only be
+        # resumed within this call.
+        with pipe:
+            response = self._request()
+            try:
+                initial_size = self._get_size(response)
+                if initial_size != "?":
+                    self.total_size = int(initial_size)
+                if self.progress_tracker is None:
+                    self.progress_tracker = ProgressTracker(initial_size, self.filename)
+                else:
+                    self.progress_tracker.add_transfer(initial_size)
+                self.validator = self._get_validator(response)
+
+                written = 0
+                attempt = 0
+                while True:
+                    try:
+                        for chunk in self._iter_chunks(response):
+                            pipe.write(chunk)
+                            written += len(chunk)
+                            self.progress_tracker.update(len(chunk))
+                        if self.total_size is not None and written < self.total_size:
+                            raise TransferInterruptedError(f"Connection closed early while streaming {self.url}")
+                        return
+                    except Exception as e:
+                        if self.total_size is None or not is_retryable(e) or attempt >= settings.RETRIES:
+                            raise
+                        wait_before_retry(e, attempt, f"Stream of {self.url} interrupted", self._abort)
+                        self._check_abort()
+                        attempt += 1
+                        response.close()
+                        response = self._request_range(written, self.total_size - 1)
+                        if response.status_code != 206:
+                            raise DownloadError(f"Server ignored range request while streaming {self.url}")
+            finally:
+                response.close()
+
+    def _request(self):
+        def _get():
+            response = get_session().get(self.url, stream=True, proxies=settings.PROXY, timeout=settings.TIMEOUT)
+            response.raise_for_status()
+            return response
+
+        return with_retries(_get, description=f"Request for {self.filename} failed", abort=self._abort)
+
+    @staticmethod
+    def _get_size(response):
+        # Content-Length counts the encoded bytes, while the body is read
+        # decoded, so an encoded body is treated as one of unknown size:
+        # it is never split into ranges or resumed at a byte offset.
+        if response.headers.get('content-encoding'):
+            return "?"
+        return response.headers.get('content-length', "?")
+
+    @staticmethod
+    def _get_validator(response):
+        validator = {}
+        if response.headers.get('etag'):
+            validator['etag'] = response.headers['etag']
+        if response.headers.get('last-modified'):
+            validator['last-modified'] = response.headers['last-modified']
+        return validator
+
+    def _load_state(self):
+        if self.total_size is None:
+            return False
+        if not (os.path.exists(self.state_filename) and os.path.exists(self.part_filename)):
+            return False
+
+        state = self.read_state(self.state_filename)
+        if state.get('source') != self.source_key:
+            logger.debug(f"Ignoring transfer state of {self.filename} from another source")
+            return False
+        stored_validator = state.get('validator', {})
+        matching_keys = set(stored_validator) & set(self.validator)
+        if state.get('size') != self.total_size or any(stored_validator[key] != self.validator[key] for key in matching_keys):
+            print_to_screen(f"{self.filename} changed on the server - restarting download", level='warning')
+            retry_stats.add_wasted_bytes(sum(part[2] for part in state.get('parts', [])))
+            return False
+        if os.path.getsize(self.part_filename) != self.total_size:
+            return False
+
+        self.parts = [list(part) for part in state.get('parts', [])]
+        return bool(self.parts)
+
+    def _save_state(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_state_save < self.state_interval:
+            return
+        with self._state_lock:
+            self._last_state_save = now
+            state = {
+                'url': self.url,
+                'source': self.source_key,
+                'size': self.total_size,
+                'validator': self.validator,
+                'parts': [list(part) for part in self.parts],
+            }
+            temp_filename = f"{self.state_filename}.tmp"
+            with open(temp_filename, 'w', encoding='utf-8') as file:
+                json.dump(state, file)
+            os.replace(temp_filename, self.state_filename)
+
+    @staticmethod
+    def _plan_parts(response, total_size):
+        single_part = [[0, total_size - 1, 0]]
+        if settings.RANGE_PARTS < 2:
+            return single_part
+        if response.headers.get('accept-ranges', '').lower() != 'bytes':
+            return single_part
+
+        part_count = min(settings.RANGE_PARTS, total_size // max(settings.MIN_PART_SIZE, 1))
+        if part_count < 2:
+            return single_part
+
+        part_size = -(-total_size // part_count)
+        return [
+            [start, min(start + part_size, total_size) - 1, 0]
+            for start in range(0, total_size, part_size)
+        ]
+
+    def _download_unsized(self, response):
+        # Without a known size there is nothing to resume against, so a
+        # failed attempt restarts the whole file.
+        attempt = 0
+        while True:
+            written = 0
+            try:
+                with open(self.part_filename, 'wb') as file:
+                    for chunk in self._iter_chunks(response):
+                        size = file.write(chunk)
+                        written += size
+                        self.progress_tracker.update(size)
+                return
+            except Exception as e:
+                response.close()
+                if not is_retryable(e) or attempt >= settings.RETRIES:
+                    raise
+                retry_stats.add_wasted_bytes(written)
+                wait_before_retry(e, attempt, f"Transfer of {self.filename} interrupted", self._abort)
+                self._check_abort()
+                attempt += 1
+                response = self._request()
+
+    def _download_parts(self, response=None):
+        pending = [index for index, (start, end, done) in enumerate(self.parts) if start + done <= end]
+        if not pending:
+            return
+        if len(self.parts) > 1:
+            logger.debug(f"Downloading {self.filename} in {len(self.parts)} ranged parts ({len(pending)} pending)")
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                futures = []
+                for index in pending:
+                    # A part starting at byte zero can be read from the response
+                    # we already have open, which saves one round-trip.
+                    if response is not None and self.parts[index][0] + self.parts[index][2] == 0:
+                        futures.append(executor.submit(metrics.bind(self._download_part), index, response))
+                        response = None
+                    else:
+                        futures.append(executor.submit(metrics.bind(self._download_part), index))
+                wait_for_transfers(futures, self._abort)
+        finally:
+            if self._discard_state:
+                delete_files(self.state_filename, self.part_filename)
+            else:
+                self._save_state(force=True)
+
+    def _download_part(self, index, response=None):
+        attempt = 0
+        while True:
+            try:
+                return self._transfer_part(index, response)
+            except Exception as e:
+                if self._abort.is_set() or not is_retryable(e) or attempt >= settings.RETRIES:
+                    raise
+                # The retry picks up from the last byte written for this part.
+                wait_before_retry(e, attempt, f"Transfer of {self.filename} interrupted", self._abort)
+                attempt += 1
+                response = None
+
+    def _transfer_part(self, index, response=None):
+        part = self.parts[index]
+        start, end = part[0], part[1]
+        if response is None:
+            self._check_abort()
+            response = self._request_range(start + part[2], end)
+            if response.status_code == 200:
+                if len(self.parts) == 1:
+                    logger.debug(f"Server ignored range request for {self.filename} - restarting from the beginning")
+                    retry_stats.add_wasted_bytes(part[2])
+                    part[2] = 0
+                else:
+                    response.close()
+                    self._discard_state = True
+                    raise DownloadError(f"{self.filename} changed on the server or ranges are not supported")
+
+        try:
+            position = start + part[2]
+            remaining = end - position + 1
+            with open(self.part_filename, 'r+b') as file:
+                file.seek(position)
+                for chunk in self._iter_chunks(response, remaining):
+                    size = file.write(chunk)
+                    part[2] += size
+                    remaining -= size
+                    self.progress_tracker.update(size)
+                    self._save_state()
+                    if remaining <= 0:
+                        break
+            if remaining > 0:
+                raise TransferInterruptedError(f"Connection closed early while downloading {self.filename} (bytes {start}-{end})")
+        finally:
+            response.close()
+
+    def _iter_chunks(self, response, limit=None):
+        # Reads into one reusable buffer and yields views of it, so the caller
+        # must consume each chunk before asking for the next one. The chunk
+        # size doubles while reads complete quickly and halves when they stall.
+        if response.headers.get('content-encoding'):
+            for chunk in response.iter_content(chunk_size=self.min_chunk_size):
+                self._check_abort()
+                metrics.add_bytes(len(chunk))
+                if self.throttle:
+                    self.throttle.consume(len(chunk))
+                yield chunk
+            return
+
+        view = memoryview(bytearray(self.max_chunk_size))
+        chunk_size = self.min_chunk_size
+        while limit is None or limit > 0:
+            self._check_abort()
+            size = chunk_size if limit is None else min(chunk_size, limit)
+            if self.throttle:
+                size = self.throttle.get_chunk_size(size)
+            started = time.monotonic()
+            try:
+                read = response.raw.readinto(view[:size])
+            except ProtocolError as e:
+                raise ChunkedEncodingError(e)
+            except ReadTimeoutError as e:
+                raise ConnectionError(e)
+            if not read:
+                return
+
+            elapsed = time.monotonic() - started
+            if read == size and elapsed < self.target_read_time / 4:
+                chunk_size = min(chunk_size * 2, self.max_chunk_size)
+            elif elapsed > self.target_read_time * 2:
+                chunk_size = max(chunk_size // 2, self.min_chunk_size)
+
+            metrics.add_bytes(read)
+            if self.throttle:
+                self.throttle.consume(read)
+            yield view[:read]
+            if limit is not None:
+                limit -= read
+
+    def _check_abort(self):
+        if self._abort.is_set():
+            raise TransferCancelledError(f"Transfer of {self.filename} cancelled")
+
+    def _preallocate(self, file):
+        if not settings.PREALLOCATE or not hasattr(os, 'posix_fallocate'):
+            return
+        try:
+            os.posix_fallocate(file.fileno(), 0, self.total_size)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise DownloadError(f"Not enough disk space for {self.filename} ({self.total_size} bytes)")
+            logger.debug(f"Could not preallocate {self.part_filename}: {e}")
+
+    def _request_range(self, start, end):
+        headers = {'Range': f'bytes={start}-{end}'}
+        etag = self.validator.get('etag')
+        if_range = etag if etag and not etag.startswith('W/') else self.validator.get('last-modified')
+        if if_range:
+            headers['If-Range'] = if_range
+        response = get_session().get(self.url, stream=True, headers=headers, proxies=settings.PROXY, timeout=settings.TIMEOUT)
+        response.raise_for_status()
+        if response.status_code == 206 and not response.headers.get('content-range', '').startswith(f'bytes {start}-'):
+            response.close()
+            raise DownloadError(f"Unexpected content range for {self.filename} (bytes {start}-{end})")
+        return response
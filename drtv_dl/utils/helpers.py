@@ -2,28 +2,21 @@ import re
 import os
 import sys
 import html
-import inspect
+import shutil
 import logging
-import requests
+import threading
 import subprocess
-from colorama import (
-    Fore, 
-    Style, 
-    init
-)
-from rich.table import Table
-from rich.console import Console
-from rich.text import Text
-from rich.box import SIMPLE_HEAVY
-
-if os.name == 'nt':
-    init(autoreset=True)
+from urllib.parse import urlsplit, urlunsplit
 
 from drtv_dl.logger import logger
 from drtv_dl.utils import settings
+from drtv_dl.utils.session import get_session
+from drtv_dl.utils.retry import with_retries
+from drtv_dl.utils.http_cache import http_cache
 from drtv_dl.exceptions import (
     DownloadError,
     StreamNotFoundError,
+    FFmpegNotAccessibleError,
 )
 
 
@@ -36,28 +29,57 @@ def print_to_screen(message, level='info'):
         return
     if not message:
         return
-    frame = inspect.currentframe().f_back
-    module = inspect.getmodule(frame)
-    module_name = module.__name__.split('.')[-1] if module else 'unknown_module'
-    locals_ = frame.f_locals
-    class_name = None
-    if 'self' in locals_:
-        class_name = locals_['self'].__class__.__name__
-    elif 'cls' in locals_:
-        class_name = locals_['cls'].__name__
-    if class_name:
-        identifier = f'{module_name}:{class_name.lower()}'
-    else:
-        identifier = module_name
     log_level = getattr(logging, level.upper(), logging.INFO)
+    if not logger.isEnabledFor(log_level):
+        return
+    identifier = _get_caller_identifier(sys._getframe(1))
     if level.lower() == 'warning':
+        Fore, Style = _get_colors()
         formatted_message = f"{Fore.YELLOW}WARNING:{Style.RESET_ALL} {message}"
     elif level.lower() == 'error':
+        Fore, Style = _get_colors()
         formatted_message = f"{Fore.RED}ERROR:{Style.RESET_ALL} {message}"
     else:
         formatted_message = message
     logger.log(log_level, formatted_message, extra={'module_class': identifier})
 
+_colors = None
+
+def _get_colors():
+    # colorama is only needed once a warning or error is printed.
+    global _colors
+    if _colors is None:
+        import colorama
+        if os.name == 'nt':
+            colorama.init(autoreset=True)
+        _colors = colorama.Fore, colorama.Style
+    return _colors
+
+_caller_identifiers = {}
+
+def _get_caller_identifier(frame):
+    # The tag depends on the calling function and, for methods, on the class
+    # of the instance, since an inherited method is tagged with the subclass.
+    # It is resolved once per pair and reused afterwards.
+    locals_ = frame.f_locals
+    if 'self' in locals_:
+        owner = locals_['self'].__class__
+    elif 'cls' in locals_:
+        owner = locals_['cls']
+    else:
+        owner = None
+    key = (frame.f_code, owner)
+    identifier = _caller_identifiers.get(key)
+    if identifier is None:
+        module_name = frame.f_globals.get('__name__', 'unknown_module').split('.')[-1]
+        class_name = getattr(owner, '__name__', None)
+        if class_name:
+            identifier = f'{module_name}:{class_name.lower()}'
+        else:
+            identifier = module_name
+        _caller_identifiers[key] = identifier
+    return identifier
+
 def search_content(pattern, text, group_num=1):
     if isinstance(pattern, str):
         pattern = re.compile(pattern, re.DOTALL)
@@ -69,21 +91,56 @@ def search_content(pattern, text, group_num=1):
     except IndexError:
         raise ValueError(f"Group {group_num} does not exist in the match.")
 
-def download_webpage(url, headers=None, data=None, params=None, json=None):
-    logger.debug(f"Requesting URL: {url}")
-    response = requests.get(
-        url=url,
-        headers=headers,
-        data=data,
-        params=params,
-        json=json,
-        proxies=settings.PROXY
-    )
-    if response.status_code == 403:
-        raise DownloadError("Access denied – likely due to geoblocking. Ensure your IP is recognized as being in Denmark by using a proxy or a VPN.")
-    response.raise_for_status()
-    logger.debug(f"Received response from {url}")
-    return response.text
+def download_webpage(url, headers=None, data=None, params=None, json=None, cache_ttl=None):
+    use_cache = cache_ttl is not None and http_cache.enabled and data is None and json is None
+    cache_key = cached = None
+    if use_cache:
+        cache_key = http_cache.get_key(url, params)
+        cached, fresh = http_cache.lookup(cache_key, cache_ttl)
+        if fresh:
+            http_cache.record('hits')
+            logger.debug(f"Using cached response for {url}")
+            return cached['body']
+
+    def _request():
+        logger.debug(f"Requesting URL: {url}")
+        request_headers = dict(headers or {})
+        if cached:
+            request_headers.update(http_cache.conditional_headers(cached))
+        response = get_session().get(
+            url=url,
+            headers=request_headers or None,
+            data=data,
+            params=params,
+            json=json,
+            proxies=settings.PROXY,
+            timeout=settings.TIMEOUT
+        )
+        if response.status_code == 403:
+            raise DownloadError("Access denied – likely due to geoblocking. Ensure your IP is recognized as being in Denmark by using a proxy or a VPN.")
+        if cached and response.status_code == 304:
+            logger.debug(f"Cached response for {url} is still valid")
+            http_cache.record('revalidated')
+            http_cache.refresh(cache_key, cached)
+            return cached['body']
+        response.raise_for_status()
+        logger.debug(f"Received response from {url}")
+        if use_cache:
+            http_cache.record('misses')
+            http_cache.store(cache_key, url, response)
+        return response.text
+
+    return with_retries(_request, description=f"Request to {url} failed")
+
+def parse_size(size):
+    if isinstance(size, (int, float)):
+        return int(size)
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([kmgKMG]?)i?[bB]?\s*', str(size))
+    if not match:
+        raise ValueError(f"Invalid size: '{size}'")
+    number, unit = match.groups()
+    multiplier = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}[unit.upper()]
+    return int(float(number) * multiplier)
 
 def extract_ids_from_url(url):
     path_parts = url.strip('/').split('/')
@@ -95,6 +152,12 @@ def extract_ids_from_url(url):
     logger.debug(f"Extracted display_id: {display_id}, item_id: {item_id}")
     return display_id, item_id
 
+def get_source_key(url):
+    # Signed CDN URLs change their query on every request, so a source is
+    # identified by its address without the query.
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, '', ''))
+
 def sanitize_filename(filename):
     sanitized = re.sub(r'[<>:"/\\|?*]', ' - ', filename)
     logger.debug(f"Sanitized filename: {sanitized}")
@@ -153,6 +216,11 @@ def get_optimal_format(formats):
     return preferred_formats[0]
 
 def print_formats(formats):
+    from rich.table import Table
+    from rich.console import Console
+    from rich.text import Text
+    from rich.box import SIMPLE_HEAVY
+
     console = Console()
     table = Table(show_header=True, header_style="bold white", box=SIMPLE_HEAVY)
 
@@ -233,9 +301,23 @@ def delete_files(*file_paths):
         except OSError as e:
             logger.error(f"Error deleting {file_path}: {e}")
 
-def is_ffmpeg_accessible():
-    try:
-        subprocess.run(["ffmpeg", "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print_to_screen("FFmpeg is not installed or not in the system PATH.", level='error')
-        sys.exit(1)
\ No newline at end of file
+_ffmpeg_info = None
+_ffmpeg_lock = threading.Lock()
+
+def get_ffmpeg_info():
+    # Probed once per process, and only by code paths that merge.
+    global _ffmpeg_info
+    with _ffmpeg_lock:
+        if _ffmpeg_info is None:
+            path = shutil.which("ffmpeg")
+            try:
+                if not path:
+                    raise FileNotFoundError("ffmpeg")
+                result = subprocess.run([path, "-version"], capture_output=True, text=True, check=True)
+            except (subprocess.CalledProcessError, OSError):
+                print_to_screen("FFmpeg is not installed or not in the system PATH.", level='error')
+                raise FFmpegNotAccessibleError("FFmpeg is not installed or not in the system PATH")
+            version = result.stdout.partition('\n')[0].split(' Copyright')[0].strip()
+            logger.debug(f"Using {version} at {path}")
+            _ffmpeg_info = {'path': path, 'version': version}
+        return _ffmpeg_info
\ No newline at end of file
@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlencode
+
+from drtv_dl.logger import logger
+from drtv_dl.utils import settings
+from drtv_dl.utils.settings import get_cache_dir
+
+class HTTPCache:
+    subdir = 'http'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._size = None
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.revalidated = 0
+            self.misses = 0
+
+    @property
+    def enabled(self):
+        return settings.HTTP_CACHE != 'off'
+
+    @staticmethod
+    def get_key(url, params=None):
+        if params:
+            url = f"{url}?{urlencode(sorted(params.items()))}"
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def lookup(self, key, ttl):
+        entry = self._load(key)
+        if entry is None:
+            return None, False
+        fresh = settings.HTTP_CACHE != 'refresh' and time.time() - entry['stored_at'] < ttl
+        return entry, fresh
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, key, url, response):
+        entry = {
+            'url': url,
+            'etag': response.headers.get('etag'),
+            'last_modified': response.headers.get('last-modified'),
+            'stored_at': time.time(),
+            'body': response.text,
+        }
+        self._save(key, entry)
+
+    def refresh(self, key, entry):
+        entry['stored_at'] = time.time()
+        self._save(key, entry)
+
+    def record(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def summary(self):
+        return f"{self.hits} fresh hits, {self.revalidated} revalidated, {self.misses} misses"
+
+    def _get_path(self, key):
+        return os.path.join(get_cache_dir(self.subdir), f"{key}.json")
+
+    def _load(self, key):
+        path = self._get_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                entry = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.debug(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def _save(self, key, entry):
+        path = self._get_path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(entry, file)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp_path, path)
+            new_size = os.path.getsize(path)
+        except OSError as e:
+            logger.debug(f"Could not write cache entry {path}: {e}")
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += new_size - old_size
+            if self._size > settings.HTTP_CACHE_MAX_SIZE:
+                self._evict()
+
+    def _list_entries(self):
+        cache_dir = get_cache_dir(self.subdir)
+        entries = []
+        for name in os.listdir(cache_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, os.path.join(cache_dir, name)))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._list_entries())
+
+    def _evict(self):
+        entries = sorted(self._list_entries())
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= settings.HTTP_CACHE_MAX_SIZE:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+                logger.debug(f"Evicted cache entry {path}")
+            except OSError:
+                pass
+
+
+http_cache = HTTPCache()
@@ -1,69 +1,207 @@
 import re
-from collections import defaultdict
 from urllib.parse import (
-    urljoin, 
+    urljoin,
     unquote
 )
 
+from drtv_dl.exceptions import DownloadError
+
+ATTRIBUTE_PATTERN = re.compile(r'([A-Z\-]+)=("([^"]*)"|([^",]*))(?:,|$)')
+MAP_URI_PATTERN = re.compile(r'^#EXT-X-MAP:.*?URI="([^"]+)"', re.MULTILINE)
+URI_PATTERN = re.compile(r'URI="([^"]+)"')
+BYTERANGE_PATTERN = re.compile(r'BYTERANGE="([^"]+)"')
+METHOD_PATTERN = re.compile(r'METHOD=([^,]+)')
+
+
+def _get_base_dir(base_uri):
+    base = base_uri.split('#', 1)[0].split('?', 1)[0]
+    scheme, separator, rest = base.partition('://')
+    if not separator or '/' not in rest:
+        return None
+    return base[:base.rfind('/') + 1]
+
+def _join_uri(base_dir, base_uri, uri):
+    # urljoin dominates parsing time on large playlists. Plain relative paths
+    # without dot segments resolve to a simple concatenation.
+    if base_dir and uri and uri[0] not in '/.?#' and ':' not in uri and '/.' not in uri:
+        return base_dir + uri
+    return urljoin(base_uri, uri)
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class VideoVariant:
+    __slots__ = ('uri', 'bandwidth', 'average_bandwidth', 'resolution', 'frame_rate',
+                 'codec', 'audio_codec', 'audio_group', 'attributes')
+
+    def __init__(self, attributes):
+        codecs = attributes.pop('codecs', '').split(',')
+        self.uri = None
+        self.bandwidth = _to_int(attributes.get('bandwidth'))
+        self.average_bandwidth = _to_int(attributes.get('average-bandwidth'))
+        width, _, height = attributes.get('resolution', '').partition('x')
+        self.resolution = (int(width), int(height)) if width.isdigit() and height.isdigit() else None
+        self.frame_rate = _to_float(attributes.get('frame-rate'))
+        self.codec = codecs[0]
+        self.audio_codec = codecs[1] if len(codecs) > 1 else None
+        self.audio_group = attributes.get('audio')
+        self.attributes = attributes
+
+    def as_dict(self):
+        result = dict(self.attributes)
+        result['audio_codec'] = self.audio_codec
+        result['uri'] = self.uri
+        result['codec'] = self.codec
+        return result
+
+
+class AudioRendition:
+    __slots__ = ('uri', 'group_id', 'name', 'language', 'codec', 'attributes')
+
+    def __init__(self, attributes, uri):
+        self.uri = uri
+        self.group_id = attributes.get('group-id')
+        self.name = attributes.get('name')
+        self.language = attributes.get('language')
+        self.codec = None
+        self.attributes = attributes
+
+    def as_dict(self):
+        result = dict(self.attributes)
+        result['uri'] = self.uri
+        result['codec'] = self.codec
+        return result
+
+
+class SubtitleRendition:
+    __slots__ = ('uri', 'group_id', 'name', 'language', 'attributes')
+
+    def __init__(self, attributes, uri):
+        self.uri = uri
+        self.group_id = attributes.get('group-id')
+        self.name = attributes.get('name')
+        self.language = attributes.get('language')
+        self.attributes = attributes
+
+    def as_dict(self):
+        result = dict(self.attributes)
+        result['uri'] = self.uri
+        return result
+
+
 class M3U8Parser:
     def __init__(self, base_uri, m3u8_content):
         self.base_uri = base_uri
         self.m3u8_content = m3u8_content.splitlines()
-        self.streams = defaultdict(list)
-        self.audio_codecs = {}
+        self._base_dir = _get_base_dir(base_uri)
 
     def parse(self):
-        current_stream = None
+        return {
+            stream_type: [record.as_dict() for record in records]
+            for stream_type, records in self.parse_records().items()
+            if records
+        }
+
+    def parse_records(self):
+        video, audio, subtitles = [], [], []
+        audio_codecs = {}
+        current_variant = None
         for line in self.m3u8_content:
             line = line.strip()
-            if line.startswith("#EXT-X-MEDIA:TYPE=AUDIO"):
-                attrs = self._parse_attributes(line)
-                attrs['uri'] = self._get_complete_uri(attrs.get('uri'))
-                self.streams['audio'].append(attrs)
-            elif line.startswith("#EXT-X-MEDIA:TYPE=SUBTITLES"):
-                attrs = self._parse_attributes(line)
-                attrs['uri'] = self._get_complete_uri(attrs.get('uri'), is_subtitle=True)
-                self.streams['subtitles'].append(attrs)
+            if not line:
+                continue
+            if line[0] != '#':
+                if current_variant is not None:
+                    current_variant.uri = self._get_complete_uri(line)
+                    video.append(current_variant)
+                    current_variant = None
             elif line.startswith("#EXT-X-STREAM-INF:"):
-                attrs = self._parse_attributes(line)
-                codecs = attrs.pop('codecs', '').split(',')
-                attrs['video_codec'] = codecs[0] if len(codecs) > 0 else None
-                attrs['audio_codec'] = codecs[1] if len(codecs) > 1 else None
-                audio_group = attrs.get('audio')
-                if audio_group and attrs['audio_codec']:
-                    self.audio_codecs[audio_group] = attrs['audio_codec']
-                current_stream = attrs
-            elif current_stream:
-                current_stream['uri'] = self._get_complete_uri(line)
-                current_stream['codec'] = current_stream.pop('video_codec')
-                self.streams['video'].append(current_stream)
-                current_stream = None
-
-        for audio_stream in self.streams['audio']:
-            group_id = audio_stream.get('group-id')
-            audio_stream['codec'] = self.audio_codecs.get(group_id)
-
-        return dict(self.streams)
-
-    def _parse_attributes(self, line):
-        attrs = {}
-        pattern = re.compile(r'([A-Z\-]+)=("([^"]*)"|([^",]*))(?:,|$)')
-        for match in pattern.findall(line):
-            key = match[0].lower()
-            value = match[2] or match[3]
-            attrs[key] = value
-        return attrs
+                current_variant = VideoVariant(self._parse_attributes(line[18:]))
+                if current_variant.audio_group and current_variant.audio_codec:
+                    audio_codecs[current_variant.audio_group] = current_variant.audio_codec
+            elif line.startswith("#EXT-X-MEDIA:TYPE=AUDIO"):
+                attrs = self._parse_attributes(line[13:])
+                audio.append(AudioRendition(attrs, self._get_complete_uri(attrs.get('uri'))))
+            elif line.startswith("#EXT-X-MEDIA:TYPE=SUBTITLES"):
+                attrs = self._parse_attributes(line[13:])
+                subtitles.append(SubtitleRendition(attrs, self._get_complete_uri(attrs.get('uri'), is_subtitle=True)))
+
+        for rendition in audio:
+            rendition.codec = audio_codecs.get(rendition.group_id)
+
+        return {'audio': audio, 'subtitles': subtitles, 'video': video}
+
+    @staticmethod
+    def _parse_attributes(attribute_list):
+        return {
+            key.lower(): quoted or unquoted
+            for key, _, quoted, unquoted in ATTRIBUTE_PATTERN.findall(attribute_list)
+        }
 
     def _get_complete_uri(self, uri, is_subtitle=False):
         if is_subtitle:
             uri = uri.replace("/playlist.m3u8", ".vtt")
-        return urljoin(self.base_uri, uri)
+        return _join_uri(self._base_dir, self.base_uri, uri)
 
     @staticmethod
     def extract_map_uri(m3u8_content, base_url):
+        uri_match = MAP_URI_PATTERN.search(m3u8_content)
+        if uri_match:
+            return urljoin(base_url, unquote(uri_match.group(1)))
+        return None
+
+    @staticmethod
+    def extract_segments(m3u8_content, base_url):
+        segments = []
+        base_dir = _get_base_dir(base_url)
+        next_offsets = {}
+        resolved_uris = {}
+        byterange = None
         for line in m3u8_content.splitlines():
-            if line.startswith('#EXT-X-MAP:'):
-                uri_match = re.search(r'URI="([^"]+)"', line)
+            line = line.strip()
+            if not line:
+                continue
+            if line[0] != '#':
+                uri = resolved_uris.get(line)
+                if uri is None:
+                    uri = resolved_uris[line] = _join_uri(base_dir, base_url, unquote(line))
+                segments.append({
+                    'uri': uri,
+                    'byterange': M3U8Parser._parse_byterange(byterange, uri, next_offsets) if byterange else None,
+                })
+                byterange = None
+            elif line.startswith('#EXT-X-BYTERANGE:'):
+                byterange = line[17:]
+            elif line.startswith('#EXT-X-MAP:'):
+                uri_match = URI_PATTERN.search(line)
                 if uri_match:
-                    return urljoin(base_url, unquote(uri_match.group(1)))
-        return None
\ No newline at end of file
+                    uri = _join_uri(base_dir, base_url, unquote(uri_match.group(1)))
+                    range_match = BYTERANGE_PATTERN.search(line)
+                    segments.append({
+                        'uri': uri,
+                        'byterange': M3U8Parser._parse_byterange(range_match.group(1), uri, next_offsets) if range_match else None,
+                    })
+            elif line.startswith('#EXT-X-KEY:'):
+                method_match = METHOD_PATTERN.search(line)
+                if method_match and method_match.group(1) != 'NONE':
+                    raise DownloadError(f"Encrypted segments ({method_match.group(1)}) are not supported")
+        return segments
+
+    @staticmethod
+    def _parse_byterange(value, uri, next_offsets):
+        # A range without an offset continues where the previous range of
+        # the same resource ended.
+        length, _, offset = value.partition('@')
+        offset = int(offset) if offset else next_offsets.get(uri, 0)
+        next_offsets[uri] = offset + int(length)
+        return offset, int(length)
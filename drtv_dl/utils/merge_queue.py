@@ -0,0 +1,45 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from drtv_dl.utils import settings
+from drtv_dl.utils.metrics import metrics
+from drtv_dl.utils.helpers import print_to_screen
+
+
+class MergeQueue:
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = max(workers or settings.MERGE_WORKERS, 1)
+        self.max_pending = max(max_pending or settings.MAX_PENDING_MERGES, 1)
+        # Merges run ffmpeg in a subprocess, so threads are enough to overlap
+        # them with the downloads.
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='drtv-dl-merge')
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def submit(self, func, *args, callback=None):
+        # Every queued merge keeps its intermediate files on disk, so the
+        # caller waits here once max_pending episodes are waiting.
+        if not self._slots.acquire(blocking=False):
+            print_to_screen(f"{self.max_pending} episode(s) waiting to be merged - pausing downloads")
+            self._slots.acquire()
+        try:
+            return self._executor.submit(metrics.bind(self._run), func, args, callback)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _run(self, func, args, callback):
+        try:
+            func(*args)
+        except Exception as e:
+            error = e
+        else:
+            error = None
+        finally:
+            self._slots.release()
+        if callback is not None:
+            callback(error)
+        elif error is not None:
+            print_to_screen(f"Merge failed: {error}", level='error')
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -1,11 +1,15 @@
-import ffmpeg
 import os
 
+from drtv_dl.logger import logger
+from drtv_dl.utils import settings
+from drtv_dl.utils.mp4_muxer import MP4Muxer
 from drtv_dl.exceptions import (
     ContainerNotSupportedError,
-    MergeError
+    MergeError,
+    RemuxNotSupportedError
 )
-from drtv_dl.utils.helpers import print_to_screen
+from drtv_dl.utils.metrics import metrics
+from drtv_dl.utils.helpers import print_to_screen, get_ffmpeg_info, delete_files
 
 class Merger:
     cwd = os.getcwd()
@@ -16,9 +20,17 @@ class Merger:
         self.audio_file = os.path.join(self.cwd, audio_file)
         self.subtitle_file = os.path.join(self.cwd, subtitle_file) if subtitle_file else None
         self.output_file = os.path.join(self.cwd, output_file)
+        # Merges write to a temporary file next to the output, which only
+        # takes the output's name once complete, so a killed or failed merge
+        # never leaves a truncated file that looks already downloaded.
+        root, extension = os.path.splitext(self.output_file)
+        self.temp_file = f"{root}.part{extension}"
         self.cfmt = cfmt
+        self.output_params = dict(self.output_params)
 
     def _get_input_streams(self):
+        import ffmpeg
+
         streams = [
             ffmpeg.input(self.video_file),
             ffmpeg.input(self.audio_file)
@@ -36,17 +48,74 @@ class Merger:
         return streams
 
     def _merge_streams(self):
+        try:
+            self._merge_to_temp_file()
+        except BaseException:
+            delete_files(self.temp_file)
+            raise
+        os.replace(self.temp_file, self.output_file)
+        return True
+
+    def _merge_to_temp_file(self):
+        if self._can_mux_natively():
+            try:
+                return MP4Muxer(self.video_file, self.audio_file, self.temp_file).mux()
+            except RemuxNotSupportedError as e:
+                logger.debug(f"Built-in muxer cannot handle {self.output_file}: {e} - using ffmpeg")
+
+        import ffmpeg
+
+        ffmpeg_path = get_ffmpeg_info()['path']
         streams  = self._get_input_streams()
         try:
             ffmpeg.output(
                 *streams,
-                self.output_file,
+                self.temp_file,
                 **self.output_params
-            ).run(quiet=True, overwrite_output=True)
+            ).run(cmd=ffmpeg_path, quiet=True, overwrite_output=True)
             return True
         except Exception as e:
             raise MergeError(f"Error merging files: {str(e)}")
 
+    def _can_mux_natively(self):
+        # The built-in muxer only interleaves fragmented MP4 tracks into a
+        # fragmented MP4; subtitles and other containers still need ffmpeg.
+        if settings.MUXER != 'native':
+            return False
+        if self.cfmt != 'mp4' or self.subtitle_file:
+            logger.debug(f"Built-in muxer does not write {self.cfmt} files{' with subtitles' if self.subtitle_file else ''} - using ffmpeg")
+            return False
+        return True
+
+    @metrics.timed('merge')
     def merge(self, note=None):
         print_to_screen(note)
         return self._merge_streams()
+
+    def start(self, note=None):
+        import ffmpeg
+
+        print_to_screen(note)
+        streams = self._get_input_streams()
+        return ffmpeg.output(
+            *streams,
+            self.temp_file,
+            **self.output_params
+        ).global_args('-nostdin').run_async(cmd=get_ffmpeg_info()['path'], quiet=True, overwrite_output=True)
+
+    def wait(self, process):
+        _, stderr = process.communicate()
+        if process.returncode != 0:
+            delete_files(self.temp_file)
+            error_lines = stderr.decode('utf-8', errors='replace').strip().splitlines()
+            raise MergeError(f"Error merging files: {error_lines[-1] if error_lines else process.returncode}")
+        return True
+
+    def commit(self):
+        # ffmpeg also exits cleanly when a track's pipe closes early, so the
+        # caller only commits once every track was written in full.
+        os.replace(self.temp_file, self.output_file)
+
+    def discard(self):
+        delete_files(self.temp_file)
+
@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import time
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+_current_item = contextvars.ContextVar('drtv_dl_metrics_item', default=None)
+
+
+class Metrics:
+    run_label = 'run'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.items = {}
+
+    @contextmanager
+    def item(self, item_id):
+        token = _current_item.set(str(item_id))
+        try:
+            yield
+        finally:
+            _current_item.reset(token)
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            with self._lock:
+                phase = self._get_item()['phases'].setdefault(name, {'calls': 0, 'seconds': 0.0})
+                phase['calls'] += 1
+                phase['seconds'] += duration
+
+    def timed(self, name):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def bind(func):
+        # Worker threads start with an empty context, so submitted work is
+        # run in a copy of the submitter's context to keep its item.
+        return functools.partial(contextvars.copy_context().run, func)
+
+    def add_bytes(self, size):
+        with self._lock:
+            self._get_item()['bytes'] += size
+
+    def add_request(self):
+        with self._lock:
+            self._get_item()['requests'] += 1
+
+    def _get_item(self):
+        label = _current_item.get() or self.run_label
+        item = self.items.get(label)
+        if item is None:
+            item = self.items[label] = {'phases': {}, 'bytes': 0, 'requests': 0}
+        return item
+
+    def to_dict(self):
+        with self._lock:
+            items = {
+                label: {
+                    'phases': {
+                        name: {'calls': phase['calls'], 'seconds': round(phase['seconds'], 6)}
+                        for name, phase in item['phases'].items()
+                    },
+                    'bytes': item['bytes'],
+                    'requests': item['requests'],
+                }
+                for label, item in self.items.items()
+            }
+        totals = {'phases': {}, 'bytes': 0, 'requests': 0}
+        for item in items.values():
+            totals['bytes'] += item['bytes']
+            totals['requests'] += item['requests']
+            for name, phase in item['phases'].items():
+                total = totals['phases'].setdefault(name, {'calls': 0, 'seconds': 0.0})
+                total['calls'] += phase['calls']
+                total['seconds'] = round(total['seconds'] + phase['seconds'], 6)
+        return {
+            'started': round(self.started, 3),
+            'duration': round(time.time() - self.started, 6),
+            'items': items,
+            'totals': totals,
+        }
+
+    def summary(self):
+        totals = self.to_dict()['totals']
+        phases = ', '.join(f"{name} {phase['seconds']:.2f}s" for name, phase in totals['phases'].items())
+        return f"{phases or 'no phases'} ({totals['bytes']} bytes in {totals['requests']} HTTP requests)"
+
+    def write_json(self, path):
+        self._write_atomic(path, json.dumps(self.to_dict(), indent=2) + '\n')
+
+    def write_prometheus(self, path):
+        report = self.to_dict()
+        lines = []
+
+        def add_metric(name, help_text, samples):
+            lines.append(f"# HELP drtv_dl_{name} {help_text}")
+            lines.append(f"# TYPE drtv_dl_{name} gauge")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{self._escape_label(value)}"' for key, value in labels.items())
+                lines.append(f"drtv_dl_{name}{{{label_text}}} {value}" if label_text else f"drtv_dl_{name} {value}")
+
+        add_metric('run_start_time_seconds', "Unix time the last run started.", [({}, report['started'])])
+        add_metric('run_duration_seconds', "Wall time of the last run.", [({}, report['duration'])])
+        add_metric('phase_duration_seconds', "Time spent in each phase of the last run, per item.", [
+            ({'item': label, 'phase': name}, phase['seconds'])
+            for label, item in report['items'].items()
+            for name, phase in item['phases'].items()
+        ])
+        add_metric('phase_calls', "Number of times each phase ran in the last run, per item.", [
+            ({'item': label, 'phase': name}, phase['calls'])
+            for label, item in report['items'].items()
+            for name, phase in item['phases'].items()
+        ])
+        add_metric('downloaded_bytes', "Bytes downloaded in the last run, per item.", [
+            ({'item': label}, item['bytes']) for label, item in report['items'].items()
+        ])
+        add_metric('http_requests', "HTTP requests sent in the last run, per item.", [
+            ({'item': label}, item['requests']) for label, item in report['items'].items()
+        ])
+        self._write_atomic(path, '\n'.join(lines) + '\n')
+
+    @staticmethod
+    def _escape_label(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    @staticmethod
+    def _write_atomic(path, text):
+        # Scrapers such as the node exporter textfile collector may read the
+        # file at any moment, so it is replaced in a single rename.
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+
+metrics = Metrics()
+
+
+class RunProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profiles = []
+
+    def start(self):
+        self._profile_thread()
+        if sys.version_info < (3, 12):
+            # Before 3.12 a profiler only sees the thread that enabled it, so
+            # every thread started during the run enables its own.
+            threading.setprofile(self._profile_thread)
+
+    def stop(self, path):
+        import pstats
+
+        threading.setprofile(None)
+        with self._lock:
+            profiles, self._profiles = self._profiles, []
+        for profile in profiles:
+            profile.disable()
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(path)
+
+    def _profile_thread(self, *args):
+        import cProfile
+
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
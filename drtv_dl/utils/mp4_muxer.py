@@ -0,0 +1,258 @@
+import os
+import mmap
+import heapq
+import struct
+
+from drtv_dl.logger import logger
+from drtv_dl.exceptions import (
+    MergeError,
+    RemuxNotSupportedError
+)
+
+# tfhd flag: the fragment carries an absolute base data offset, which has
+# to follow the fragment to its new position in the output.
+BASE_DATA_OFFSET_PRESENT = 0x000001
+
+
+def _iter_boxes(data, start, end):
+    position = start
+    while position + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, position)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, position + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - position
+        if size < header or position + size > end:
+            raise RemuxNotSupportedError(f"Truncated {box_type.decode('latin-1')} box at byte {position}")
+        yield box_type, position, header, size
+        position += size
+
+def _find_box(data, start, end, path):
+    for box_type, position, header, size in _iter_boxes(data, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return position, header, size
+            return _find_box(data, position + header, position + size, path[1:])
+    return None
+
+def _make_box(box_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+class _Track:
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        try:
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise RemuxNotSupportedError(f"{filename} is empty")
+        self.view = memoryview(self.data)
+        self.ftyp = None
+        self.moov = None
+        self.fragments = []
+        try:
+            self._parse()
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        self.view.release()
+        self.data.close()
+        self._file.close()
+
+    def _parse(self):
+        data = self.data
+        for box_type, position, header, size in _iter_boxes(data, 0, len(data)):
+            if box_type == b'ftyp':
+                self.ftyp = (position, size)
+            elif box_type == b'moov':
+                self.moov = (position, header, size)
+            elif box_type == b'moof':
+                self.fragments.append([position, size])
+            elif box_type == b'mdat':
+                if not self.fragments or len(self.fragments[-1]) != 2 or sum(self.fragments[-1]) != position:
+                    raise RemuxNotSupportedError(f"{self.filename} has media data outside of movie fragments")
+                self.fragments[-1].append(size)
+        if self.moov is None or not self.fragments:
+            raise RemuxNotSupportedError(f"{self.filename} is not a fragmented MP4 file")
+        if any(len(fragment) != 3 for fragment in self.fragments):
+            raise RemuxNotSupportedError(f"{self.filename} has a movie fragment without media data")
+
+        moov_position, moov_header, moov_size = self.moov
+        moov_start, moov_end = moov_position + moov_header, moov_position + moov_size
+        traks = [box for box in _iter_boxes(data, moov_start, moov_end) if box[0] == b'trak']
+        if len(traks) != 1:
+            raise RemuxNotSupportedError(f"{self.filename} has {len(traks)} tracks, expected one")
+        _, trak_position, trak_header, trak_size = traks[0]
+        self.trak = (trak_position, trak_size)
+        trak_start, trak_end = trak_position + trak_header, trak_position + trak_size
+
+        mvhd = _find_box(data, moov_start, moov_end, [b'mvhd'])
+        mdhd = _find_box(data, trak_start, trak_end, [b'mdia', b'mdhd'])
+        hdlr = _find_box(data, trak_start, trak_end, [b'mdia', b'hdlr'])
+        trex = _find_box(data, moov_start, moov_end, [b'mvex', b'trex'])
+        if not (mvhd and mdhd and hdlr and trex):
+            raise RemuxNotSupportedError(f"{self.filename} is missing required movie headers")
+        self.mvhd = mvhd
+        self.trex = trex
+        self.movie_timescale = self._read_timescale(mvhd)
+        self.media_timescale = self._read_timescale(mdhd)
+        self.handler = bytes(data[hdlr[0] + hdlr[1] + 8:hdlr[0] + hdlr[1] + 12])
+        self.start_times = [self._parse_fragment(fragment[0], fragment[1]) for fragment in self.fragments]
+
+    def _read_timescale(self, box):
+        position, header, _ = box
+        version = self.data[position + header]
+        return struct.unpack_from('>I', self.data, position + header + (20 if version == 1 else 12))[0]
+
+    def _parse_fragment(self, moof_position, moof_size):
+        # Every box that _write_fragments rewrites is checked here, before
+        # anything is written, so unusual input falls back to ffmpeg.
+        data = self.data
+        if _find_box(data, moof_position + 8, moof_position + moof_size, [b'mfhd']) is None:
+            raise RemuxNotSupportedError(f"{self.filename} has a movie fragment without a header")
+        trafs = [box for box in _iter_boxes(data, moof_position + 8, moof_position + moof_size) if box[0] == b'traf']
+        if len(trafs) != 1:
+            raise RemuxNotSupportedError(f"{self.filename} has a movie fragment with {len(trafs)} track fragments")
+        _, traf_position, traf_header, traf_size = trafs[0]
+        if _find_box(data, traf_position + traf_header, traf_position + traf_size, [b'tfhd']) is None:
+            raise RemuxNotSupportedError(f"{self.filename} has a track fragment without a header")
+        tfdt = _find_box(data, traf_position + traf_header, traf_position + traf_size, [b'tfdt'])
+        if tfdt is None:
+            raise RemuxNotSupportedError(f"{self.filename} has a movie fragment without a decode time")
+        position, header, _ = tfdt
+        if data[position + header] == 1:
+            decode_time = struct.unpack_from('>Q', data, position + header + 4)[0]
+        else:
+            decode_time = struct.unpack_from('>I', data, position + header + 4)[0]
+        return decode_time / self.media_timescale
+
+    def build_trak(self, track_id, movie_timescale):
+        # The track keeps all of its boxes; only its ID and the durations
+        # given in the movie timescale are rewritten.
+        position, size = self.trak
+        trak = bytearray(self.data[position:position + size])
+        header = 16 if struct.unpack_from('>I', trak, 0)[0] == 1 else 8
+        tkhd = _find_box(trak, header, len(trak), [b'tkhd'])
+        if tkhd is None:
+            raise RemuxNotSupportedError(f"{self.filename} is missing its track header")
+        tkhd_content = tkhd[0] + tkhd[1]
+        if trak[tkhd_content] == 1:
+            struct.pack_into('>I', trak, tkhd_content + 20, track_id)
+            duration_offset, duration_format = tkhd_content + 28, '>Q'
+        else:
+            struct.pack_into('>I', trak, tkhd_content + 12, track_id)
+            duration_offset, duration_format = tkhd_content + 20, '>I'
+        if movie_timescale != self.movie_timescale:
+            self._rescale(trak, duration_offset, duration_format, movie_timescale)
+            elst = _find_box(trak, header, len(trak), [b'edts', b'elst'])
+            if elst is not None:
+                elst_content = elst[0] + elst[1]
+                version = trak[elst_content]
+                entry_count = struct.unpack_from('>I', trak, elst_content + 4)[0]
+                entry_size, duration_format = (20, '>Q') if version == 1 else (12, '>I')
+                for index in range(entry_count):
+                    self._rescale(trak, elst_content + 8 + index * entry_size, duration_format, movie_timescale)
+        return bytes(trak)
+
+    def _rescale(self, buffer, offset, value_format, movie_timescale):
+        value = struct.unpack_from(value_format, buffer, offset)[0]
+        if value not in (0, 0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+            struct.pack_into(value_format, buffer, offset, value * movie_timescale // self.movie_timescale)
+
+    def build_trex(self, track_id):
+        position, _, size = self.trex
+        trex = bytearray(self.data[position:position + size])
+        struct.pack_into('>I', trex, self.trex[1] + 4, track_id)
+        return bytes(trex)
+
+    def get_duration(self, movie_timescale):
+        position, header, _ = self.mvhd
+        if self.data[position + header] == 1:
+            duration = struct.unpack_from('>Q', self.data, position + header + 24)[0]
+        else:
+            duration = struct.unpack_from('>I', self.data, position + header + 16)[0]
+        return duration * movie_timescale // self.movie_timescale
+
+
+class MP4Muxer:
+    def __init__(self, video_file, audio_file, output_file):
+        self.video_file = video_file
+        self.audio_file = audio_file
+        self.output_file = output_file
+
+    def mux(self):
+        tracks = []
+        try:
+            tracks.append(_Track(self.video_file))
+            tracks.append(_Track(self.audio_file))
+            video, audio = tracks
+            if video.handler != b'vide' or audio.handler != b'soun':
+                raise RemuxNotSupportedError(f"Expected a video and an audio track, found {video.handler!r} and {audio.handler!r}")
+            header = self._build_header(video, audio)
+            try:
+                with open(self.output_file, 'wb') as output:
+                    output.write(header)
+                    self._write_fragments(output, tracks)
+            except BaseException as e:
+                if os.path.exists(self.output_file):
+                    os.remove(self.output_file)
+                if isinstance(e, OSError):
+                    raise MergeError(f"Error writing {self.output_file}: {e}")
+                raise
+        finally:
+            for track in tracks:
+                track.close()
+        return True
+
+    @staticmethod
+    def _build_header(video, audio):
+        ftyp_position, ftyp_size = video.ftyp if video.ftyp else (None, 0)
+        ftyp = bytes(video.data[ftyp_position:ftyp_position + ftyp_size]) if video.ftyp else b''
+
+        # The video track's movie header becomes the output's, with the
+        # longer duration of the two and room for both track IDs.
+        mvhd_position, mvhd_header, mvhd_size = video.mvhd
+        mvhd = bytearray(video.data[mvhd_position:mvhd_position + mvhd_size])
+        timescale = video.movie_timescale
+        duration = max(video.get_duration(timescale), audio.get_duration(timescale))
+        if mvhd[mvhd_header] == 1:
+            struct.pack_into('>Q', mvhd, mvhd_header + 24, duration)
+        else:
+            struct.pack_into('>I', mvhd, mvhd_header + 16, min(duration, 0xFFFFFFFF))
+        struct.pack_into('>I', mvhd, mvhd_size - 4, 3)
+
+        mvex = _make_box(b'mvex', video.build_trex(1) + audio.build_trex(2))
+        moov = _make_box(b'moov', bytes(mvhd) + video.build_trak(1, timescale) + audio.build_trak(2, timescale) + mvex)
+        return ftyp + moov
+
+    @staticmethod
+    def _write_fragments(output, tracks):
+        # Fragments of both tracks are copied whole, ordered by decode time,
+        # so the relative data offsets inside each one stay valid. sidx,
+        # styp and mfra boxes describe the input layout and are dropped.
+        ordered = heapq.merge(*[
+            [(start_time, track_id, index) for index, start_time in enumerate(track.start_times)]
+            for track_id, track in enumerate(tracks, start=1)
+        ])
+        for sequence_number, (_, track_id, index) in enumerate(ordered, start=1):
+            track = tracks[track_id - 1]
+            moof_position, moof_size, mdat_size = track.fragments[index]
+            moof = bytearray(track.data[moof_position:moof_position + moof_size])
+            mfhd = _find_box(moof, 8, moof_size, [b'mfhd'])
+            struct.pack_into('>I', moof, mfhd[0] + mfhd[1] + 4, sequence_number)
+            tfhd = _find_box(moof, 8, moof_size, [b'traf', b'tfhd'])
+            tfhd_content = tfhd[0] + tfhd[1]
+            struct.pack_into('>I', moof, tfhd_content + 4, track_id)
+            flags = struct.unpack_from('>I', moof, tfhd_content)[0] & 0xFFFFFF
+            if flags & BASE_DATA_OFFSET_PRESENT:
+                base_data_offset = struct.unpack_from('>Q', moof, tfhd_content + 8)[0]
+                struct.pack_into('>Q', moof, tfhd_content + 8, base_data_offset - moof_position + output.tell())
+            output.write(moof)
+            output.write(track.view[moof_position + moof_size:moof_position + moof_size + mdat_size])
+        logger.debug(f"Interleaved {sum(len(track.fragments) for track in tracks)} fragments")
@@ -1,6 +1,10 @@
 import sys
-from drtv_dl.utils import settings
+import json
 import time
+import threading
+
+from drtv_dl.logger import logger
+from drtv_dl.utils import settings
 
 
 class ProgressTracker:
@@ -9,9 +13,14 @@ class ProgressTracker:
         self.downloaded = 0
         self.filename = filename
         self.start_time = time.time()
-        self.longest_line = 0
+        self.speed = None
+        self._sampled_size = 0
+        self._sampled_at = self.start_time
+        self._lock = threading.Lock()
+        progress_renderer.register(self)
 
-    def get_appropriate_unit(self, size):
+    @staticmethod
+    def get_appropriate_unit(size):
         if size == "?":
             return 'MB', 1024 * 1024
         if size < 1024 * 1024:
@@ -21,26 +30,198 @@ class ProgressTracker:
         else:
             return 'GB', 1024 * 1024 * 1024
 
+    def add_transfer(self, size):
+        with self._lock:
+            if size == "?" or self.total_size == "?":
+                self.total_size = "?"
+            else:
+                self.total_size += int(size)
+
     def update(self, chunk_size):
-        if settings.SUPPRESS_OUTPUT:
-            return
-        self.downloaded += chunk_size
-        if self.total_size != "?" and self.downloaded > self.total_size:
-            self.total_size = self.downloaded
-        unit, divisor = self.get_appropriate_unit(self.total_size)
-        downloaded_unit = self.downloaded / divisor
-        total_unit = "?" if self.total_size == "?" else self.total_size / divisor
-
-        elapsed_time = time.time() - self.start_time
-        if elapsed_time > 0:
-            dlspeed = self.downloaded / (elapsed_time * 1024 * 1024)
-            total_display = "?" if self.total_size == "?" else f"{total_unit:.2f}"
-            percentage_done = "?" if self.total_size == "?" else f"{(downloaded_unit / total_unit) * 100:.0f}"
-            progress_line = f'\r  ~ {downloaded_unit:.2f}/{total_display} {unit} at {dlspeed:.2f} MB/s - {percentage_done}%'
-            padded_line = progress_line.ljust(self.longest_line)
-            self.longest_line = max(self.longest_line, len(progress_line))
-            print(padded_line, end='', file=sys.stderr, flush=True)
+        # Called for every chunk, so it only counts. Drawing happens on the
+        # renderer thread at the configured refresh rate.
+        with self._lock:
+            self.downloaded += chunk_size
 
     def finish(self):
-        if not settings.SUPPRESS_OUTPUT:
-            print(file=sys.stderr)
+        progress_renderer.unregister(self)
+
+    def sample(self, now, smoothing):
+        elapsed = now - self._sampled_at
+        if elapsed <= 0:
+            return
+        downloaded = self.downloaded
+        current_speed = (downloaded - self._sampled_size) / elapsed
+        if self.speed is None:
+            self.speed = current_speed
+        else:
+            self.speed = smoothing * current_speed + (1 - smoothing) * self.speed
+        self._sampled_size = downloaded
+        self._sampled_at = now
+
+    def get_eta(self):
+        if self.total_size == "?" or not self.speed:
+            return None
+        return max(self.total_size - self.downloaded, 0) / self.speed
+
+
+class ProgressRenderer:
+    smoothing = 0.3
+    name_width = 40
+
+    def __init__(self):
+        self._trackers = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._lines_drawn = 0
+        for handler in logger.handlers:
+            handler.addFilter(self._clear_before_log)
+
+    @property
+    def mode(self):
+        if settings.PROGRESS_MODE == 'text' and settings.SUPPRESS_OUTPUT:
+            return 'off'
+        return settings.PROGRESS_MODE
+
+    def register(self, tracker):
+        with self._lock:
+            self._trackers.append(tracker)
+            if self._thread is None and self.mode != 'off':
+                self._thread = threading.Thread(target=self._run, name='drtv-dl-progress', daemon=True)
+                self._thread.start()
+
+    def unregister(self, tracker):
+        with self._lock:
+            if tracker not in self._trackers:
+                return
+            tracker.sample(time.time(), self.smoothing)
+            self._trackers.remove(tracker)
+            mode = self.mode
+            if mode == 'text' and tracker.downloaded:
+                self._clear()
+                self._write(sys.stderr, self._format_line(tracker, finished=True) + '\n')
+                self._draw()
+            elif mode == 'json':
+                self._write(sys.stdout, json.dumps({'event': 'finished', **self._get_record(tracker)}) + '\n')
+
+    def _run(self):
+        while True:
+            time.sleep(settings.PROGRESS_INTERVAL)
+            with self._lock:
+                if not self._trackers:
+                    self._clear()
+                    self._thread = None
+                    return
+                now = time.time()
+                for tracker in self._trackers:
+                    tracker.sample(now, self.smoothing)
+                mode = self.mode
+                if mode == 'text':
+                    self._clear()
+                    self._draw()
+                elif mode == 'json':
+                    self._write(sys.stdout, json.dumps(self._get_snapshot()) + '\n')
+
+    def _draw(self):
+        if not self._trackers:
+            return
+        lines = [self._format_line(tracker) for tracker in self._trackers]
+        if len(self._trackers) > 1:
+            lines.append(self._format_total())
+        if not sys.stderr.isatty():
+            # Without a terminal the block cannot be redrawn in place, so
+            # only the last line is written, once per refresh.
+            lines = lines[-1:]
+        self._write(sys.stderr, '\n'.join(lines))
+        self._lines_drawn = len(lines)
+
+    def _clear(self):
+        if not self._lines_drawn:
+            return
+        if sys.stderr.isatty():
+            self._write(sys.stderr, '\r\x1b[2K' + '\x1b[1A\x1b[2K' * (self._lines_drawn - 1))
+        else:
+            self._write(sys.stderr, '\n')
+        self._lines_drawn = 0
+
+    def _clear_before_log(self, record):
+        # Log messages share stderr with the live block, so the block is
+        # removed first and redrawn below the message on the next refresh.
+        if self._lines_drawn:
+            with self._lock:
+                self._clear()
+        return True
+
+    def _format_line(self, tracker, finished=False):
+        name = tracker.filename
+        if len(name) > self.name_width:
+            name = name[:self.name_width - 3] + '...'
+        if finished:
+            elapsed = time.time() - tracker.start_time
+            return f"  ~ {name}: " + self._format_progress(
+                tracker.downloaded,
+                tracker.total_size,
+                tracker.downloaded / elapsed if elapsed > 0 else None,
+                elapsed=elapsed
+            )
+        return f"  ~ {name}: " + self._format_progress(tracker.downloaded, tracker.total_size, tracker.speed, tracker.get_eta())
+
+    def _format_total(self):
+        downloaded = sum(tracker.downloaded for tracker in self._trackers)
+        sizes = [tracker.total_size for tracker in self._trackers]
+        total_size = "?" if "?" in sizes else sum(sizes)
+        speed = sum(tracker.speed or 0 for tracker in self._trackers)
+        eta = None
+        if total_size != "?" and speed:
+            eta = max(total_size - downloaded, 0) / speed
+        return f"  = {len(self._trackers)} transfers: " + self._format_progress(downloaded, total_size, speed, eta)
+
+    @staticmethod
+    def _format_progress(downloaded, total_size, speed, eta=None, elapsed=None):
+        unit, divisor = ProgressTracker.get_appropriate_unit(total_size if total_size != "?" else downloaded)
+        total_display = "?" if total_size == "?" else f"{total_size / divisor:.2f}"
+        percentage_done = "?" if total_size in ("?", 0) else f"{min(downloaded / total_size, 1) * 100:.0f}"
+        line = f"{downloaded / divisor:.2f}/{total_display} {unit} at {(speed or 0) / (1024 * 1024):.2f} MB/s - {percentage_done}%"
+        if elapsed is not None:
+            line += f" in {ProgressRenderer._format_duration(elapsed)}"
+        elif eta is not None:
+            line += f" ETA {ProgressRenderer._format_duration(eta)}"
+        return line
+
+    @staticmethod
+    def _format_duration(seconds):
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+    @staticmethod
+    def _get_record(tracker):
+        eta = tracker.get_eta()
+        return {
+            'name': tracker.filename,
+            'downloaded': tracker.downloaded,
+            'total': None if tracker.total_size == "?" else tracker.total_size,
+            'speed': round(tracker.speed or 0),
+            'eta': None if eta is None else round(eta, 1),
+            'elapsed': round(time.time() - tracker.start_time, 1),
+        }
+
+    def _get_snapshot(self):
+        transfers = [self._get_record(tracker) for tracker in self._trackers]
+        totals = [transfer['total'] for transfer in transfers]
+        return {
+            'event': 'progress',
+            'time': round(time.time(), 3),
+            'downloaded': sum(transfer['downloaded'] for transfer in transfers),
+            'total': None if None in totals else sum(totals),
+            'speed': sum(transfer['speed'] for transfer in transfers),
+            'transfers': transfers,
+        }
+
+    @staticmethod
+    def _write(stream, text):
+        stream.write(text)
+        stream.flush()
+
+
+progress_renderer = ProgressRenderer()
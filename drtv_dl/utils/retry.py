@@ -0,0 +1,111 @@
+import time
+import random
+import threading
+from concurrent.futures import wait, FIRST_EXCEPTION
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from requests.exceptions import (
+    ConnectionError,
+    Timeout,
+    ChunkedEncodingError,
+    HTTPError
+)
+
+from drtv_dl.utils import settings
+from drtv_dl.exceptions import TransferInterruptedError, TransferCancelledError
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RetryStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.wasted_bytes = 0
+
+    def add_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def add_wasted_bytes(self, size):
+        with self._lock:
+            self.wasted_bytes += size
+
+    def reset(self):
+        with self._lock:
+            self.retries = 0
+            self.wasted_bytes = 0
+
+    def summary(self):
+        return f"{self.retries} retries, {self.wasted_bytes / (1024 * 1024):.2f} MB re-downloaded"
+
+
+retry_stats = RetryStats()
+
+
+def is_retryable(exception):
+    if isinstance(exception, HTTPError):
+        return exception.response is not None and exception.response.status_code in RETRY_STATUS_CODES
+    return isinstance(exception, (ConnectionError, Timeout, ChunkedEncodingError, TransferInterruptedError))
+
+def get_retry_after(exception):
+    response = getattr(exception, 'response', None)
+    if response is None:
+        return None
+    retry_after = response.headers.get('retry-after')
+    if not retry_after:
+        return None
+    if retry_after.strip().isdigit():
+        return float(retry_after)
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+
+def get_retry_delay(attempt, retry_after=None):
+    if retry_after is not None:
+        return min(retry_after, settings.RETRY_MAX_DELAY)
+    delay = min(settings.RETRY_BACKOFF * 2 ** attempt, settings.RETRY_MAX_DELAY)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def wait_before_retry(exception, attempt, description, abort=None):
+    from drtv_dl.utils.helpers import print_to_screen
+    delay = get_retry_delay(attempt, get_retry_after(exception))
+    retry_stats.add_retry()
+    print_to_screen(f"{description}: {exception} - retrying in {delay:.1f}s "
+                    f"(attempt {attempt + 1} of {settings.RETRIES})", level='warning')
+    if abort is None:
+        time.sleep(delay)
+    else:
+        abort.wait(delay)
+
+def with_retries(func, description, abort=None):
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            if (abort is not None and abort.is_set()) or not is_retryable(e) or attempt >= settings.RETRIES:
+                raise
+            wait_before_retry(e, attempt, description, abort)
+            if abort is not None and abort.is_set():
+                raise
+            attempt += 1
+
+def wait_for_transfers(futures, abort):
+    # The first failure sets abort, so the other transfers stop at their next
+    # read instead of running to the end. That failure is raised rather than
+    # the cancellations it caused.
+    try:
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        if any(future.exception() is not None for future in done):
+            abort.set()
+        wait(futures)
+    except BaseException:
+        abort.set()
+        raise
+    errors = [future.exception() for future in futures if future.exception() is not None]
+    if errors:
+        raise next((error for error in errors if not isinstance(error, TransferCancelledError)), errors[0])
+    return [future.result() for future in futures]
@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from drtv_dl.logger import logger
+from drtv_dl.utils import settings
+from drtv_dl.utils.session import get_session
+from drtv_dl.utils.retry import with_retries
+from drtv_dl.utils.metrics import metrics
+from drtv_dl.utils.progress_tracker import ProgressTracker
+from drtv_dl.utils.file_downloader import FileDownloader
+from drtv_dl.utils.helpers import print_to_screen, get_source_key
+from drtv_dl.exceptions import (
+    TransferInterruptedError,
+    TransferCancelledError
+)
+
+class SegmentDownloader:
+    state_interval = 2
+    window_per_worker = 2
+
+    def __init__(self, segments, filename, progress_tracker=None, throttle=None, abort=None):
+        self.segments = segments
+        self.source_key = get_source_key(segments[0]['uri'])
+        self.filename = filename
+        self.throttle = throttle
+        self.part_filename = f"{filename}.part"
+        self.state_filename = f"{filename}.part.json"
+        self.progress_tracker = progress_tracker
+        self._last_state_save = 0
+        self._abort = abort if abort is not None else threading.Event()
+
+    def download(self):
+        if FileDownloader.is_complete(self.filename, self.source_key):
+            print_to_screen(f"Reusing already downloaded {self.filename}")
+            return
+
+        completed, written = self._load_state()
+        if completed:
+            print_to_screen(f"Resuming {self.filename} at segment {completed + 1} of {len(self.segments)}")
+
+        owns_tracker = self._attach_tracker(completed)
+        print_to_screen(f"Destination: {self.filename}")
+        try:
+            with open(self.part_filename, 'r+b' if completed else 'wb') as file:
+                file.truncate(written)
+                file.seek(written)
+                written = self._write_segments(file, completed, written)
+            os.replace(self.part_filename, self.filename)
+            self._save_state(len(self.segments), written, force=True)
+        finally:
+            if owns_tracker:
+                self.progress_tracker.finish()
+
+    def download_to_pipe(self, pipe):
+        with pipe:
+            owns_tracker = self._attach_tracker(0)
+            try:
+                self._write_segments(pipe, 0)
+            finally:
+                if owns_tracker:
+                    self.progress_tracker.finish()
+
+    def _attach_tracker(self, first_index):
+        remaining = self.segments[first_index:]
+        if all(segment['byterange'] for segment in remaining):
+            remaining_size = sum(segment['byterange'][1] for segment in remaining)
+        else:
+            remaining_size = "?"
+        if self.progress_tracker is None:
+            self.progress_tracker = ProgressTracker(remaining_size, self.filename)
+            return True
+        self.progress_tracker.add_transfer(remaining_size)
+        return False
+
+    def _write_segments(self, file, first_index, written=None):
+        # Segments are fetched concurrently but written strictly in order. At
+        # most a fixed window of them is held in memory while an earlier one
+        # is still outstanding.
+        workers = max(settings.RANGE_PARTS, 1)
+        window = workers * self.window_per_worker
+        logger.debug(f"Downloading {len(self.segments) - first_index} segments of {self.filename} with {workers} workers")
+
+        pending = deque()
+        next_index = first_index
+        completed = first_index
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                while next_index < len(self.segments) or pending:
+                    while next_index < len(self.segments) and len(pending) < window:
+                        pending.append(executor.submit(metrics.bind(self._fetch_segment), next_index))
+                        next_index += 1
+                    data = pending.popleft().result()
+                    file.write(data)
+                    completed += 1
+                    self.progress_tracker.update(len(data))
+                    if written is not None:
+                        written += len(data)
+                        file.flush()
+                        self._save_state(completed, written)
+            except BaseException:
+                self._abort.set()
+                for future in pending:
+                    future.cancel()
+                if written is not None:
+                    self._save_state(completed, written, force=True)
+                raise
+        return written
+
+    def _fetch_segment(self, index):
+        segment = self.segments[index]
+        headers = None
+        if segment['byterange']:
+            offset, length = segment['byterange']
+            headers = {'Range': f'bytes={offset}-{offset + length - 1}'}
+
+        def _get():
+            if self._abort.is_set():
+                raise TransferCancelledError(f"Segment {index + 1} of {self.filename} cancelled")
+            response = get_session().get(segment['uri'], headers=headers, proxies=settings.PROXY, timeout=settings.TIMEOUT)
+            response.raise_for_status()
+            data = response.content
+            metrics.add_bytes(len(data))
+            if segment['byterange']:
+                if response.status_code == 200 and len(data) > length:
+                    logger.debug(f"Server ignored range request for segment {index + 1} of {self.filename}")
+                    data = data[offset:offset + length]
+                if len(data) != length:
+                    raise TransferInterruptedError(f"Segment {index + 1} of {self.filename} is {len(data)} bytes, expected {length}")
+            if self.throttle:
+                self.throttle.consume(len(data))
+            return data
+
+        return with_retries(_get, description=f"Segment {index + 1} of {self.filename} failed", abort=self._abort)
+
+    def _load_state(self):
+        if not (os.path.exists(self.state_filename) and os.path.exists(self.part_filename)):
+            return 0, 0
+
+        try:
+            with open(self.state_filename, 'r', encoding='utf-8') as file:
+                state = json.load(file)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Ignoring unreadable transfer state {self.state_filename}: {e}")
+            return 0, 0
+
+        # Segment URLs may be signed, so the playlist is identified by its
+        # first segment without the query.
+        if state.get('segments') != len(self.segments) or state.get('source') != self.source_key:
+            print_to_screen(f"{self.filename} changed on the server - restarting download", level='warning')
+            return 0, 0
+        completed, written = state.get('completed', 0), state.get('size', 0)
+        if os.path.getsize(self.part_filename) < written:
+            return 0, 0
+        return completed, written
+
+    def _save_state(self, completed, written, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_state_save < self.state_interval:
+            return
+        self._last_state_save = now
+        state = {
+            'url': self.segments[0]['uri'],
+            'source': self.source_key,
+            'segments': len(self.segments),
+            'completed': completed,
+            'size': written,
+        }
+        temp_filename = f"{self.state_filename}.tmp"
+        with open(temp_filename, 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+        os.replace(temp_filename, self.state_filename)
@@ -0,0 +1,109 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import (
+    HTTPConnectionPool,
+    HTTPSConnectionPool
+)
+
+from drtv_dl.logger import logger
+from drtv_dl.utils import settings
+from drtv_dl.utils.metrics import metrics
+
+
+class ConnectionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    def add_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def add_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    @property
+    def reused(self):
+        return max(self.requests - self.connections, 0)
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.connections = 0
+
+    def summary(self):
+        return f"{self.requests} HTTP requests over {self.connections} connections ({self.reused} reused)"
+
+
+connection_stats = ConnectionStats()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        connection_stats.add_connection()
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        connection_stats.add_connection()
+        return super()._new_conn()
+
+
+_POOL_CLASSES = {
+    'http': _CountingHTTPConnectionPool,
+    'https': _CountingHTTPSConnectionPool,
+}
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _POOL_CLASSES
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        manager.pool_classes_by_scheme = _POOL_CLASSES
+        return manager
+
+    def send(self, request, **kwargs):
+        connection_stats.add_request()
+        metrics.add_request()
+        return super().send(request, **kwargs)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+def _build_session():
+    session = requests.Session()
+    adapter = PooledHTTPAdapter(
+        pool_connections=settings.POOL_CONNECTIONS,
+        pool_maxsize=settings.POOL_MAXSIZE,
+        pool_block=False
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if not settings.KEEP_ALIVE:
+        session.headers['Connection'] = 'close'
+    logger.debug(f"Created HTTP session (pool_connections={settings.POOL_CONNECTIONS}, "
+                 f"pool_maxsize={settings.POOL_MAXSIZE}, keep_alive={settings.KEEP_ALIVE})")
+    return session
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+def reset_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
@@ -1,5 +1,28 @@
+import os
+
 SUPPRESS_OUTPUT = False
 PROXY = None
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 10
+KEEP_ALIVE = True
+RANGE_PARTS = 4
+MIN_PART_SIZE = 16 * 1024 * 1024
+PREALLOCATE = True
+RATE_LIMIT = None
+JOB_RATE_LIMIT = None
+MERGE_WORKERS = 1
+MUXER = 'ffmpeg'
+MAX_PENDING_MERGES = 2
+TIMEOUT = 30
+RETRIES = 5
+RETRY_BACKOFF = 1.0
+RETRY_MAX_DELAY = 60
+CACHE_DIR = None
+TOKEN_CACHE = True
+HTTP_CACHE = 'use'
+HTTP_CACHE_MAX_SIZE = 64 * 1024 * 1024
+PROGRESS_MODE = 'text'
+PROGRESS_INTERVAL = 0.5
 
 def set_suppress_output(suppress):
     global SUPPRESS_OUTPUT
@@ -19,4 +42,81 @@ def set_proxy(proxy):
         PROXY = {
             'http': f'http://{proxy}',
             'https': f'http://{proxy}'
-        }
\ No newline at end of file
+        }
+
+def set_pool_options(pool_size=None, keep_alive=None):
+    from drtv_dl.utils.session import reset_session
+    global POOL_CONNECTIONS, POOL_MAXSIZE, KEEP_ALIVE
+    if pool_size is not None:
+        POOL_CONNECTIONS = pool_size
+        POOL_MAXSIZE = pool_size
+    if keep_alive is not None:
+        KEEP_ALIVE = keep_alive
+    reset_session()
+
+def set_range_options(parts=None, min_part_size=None):
+    global RANGE_PARTS, MIN_PART_SIZE
+    if parts is not None:
+        RANGE_PARTS = parts
+    if min_part_size is not None:
+        MIN_PART_SIZE = min_part_size
+
+def set_preallocate(preallocate):
+    global PREALLOCATE
+    PREALLOCATE = preallocate
+
+def set_rate_limits(rate_limit=None, job_rate_limit=None):
+    global RATE_LIMIT, JOB_RATE_LIMIT
+    RATE_LIMIT = rate_limit
+    JOB_RATE_LIMIT = job_rate_limit
+
+def set_merge_options(workers=None, max_pending=None):
+    global MERGE_WORKERS, MAX_PENDING_MERGES
+    if workers is not None:
+        MERGE_WORKERS = workers
+    if max_pending is not None:
+        MAX_PENDING_MERGES = max(max_pending, 1)
+
+def set_muxer(muxer):
+    global MUXER
+    if muxer not in ('ffmpeg', 'native'):
+        raise ValueError(f"Invalid muxer: '{muxer}'")
+    MUXER = muxer
+
+def set_retry_options(retries=None, backoff=None, timeout=None):
+    global RETRIES, RETRY_BACKOFF, TIMEOUT
+    if retries is not None:
+        RETRIES = retries
+    if backoff is not None:
+        RETRY_BACKOFF = backoff
+    if timeout is not None:
+        TIMEOUT = timeout
+
+def set_cache_options(cache_dir=None, token_cache=None, http_cache=None):
+    global CACHE_DIR, TOKEN_CACHE, HTTP_CACHE
+    if cache_dir is not None:
+        CACHE_DIR = cache_dir
+    if token_cache is not None:
+        TOKEN_CACHE = token_cache
+    if http_cache is not None:
+        HTTP_CACHE = http_cache
+
+def set_progress_options(mode=None, interval=None):
+    global PROGRESS_MODE, PROGRESS_INTERVAL
+    if mode is not None:
+        if mode not in ('text', 'json', 'off'):
+            raise ValueError(f"Invalid progress mode: '{mode}'")
+        PROGRESS_MODE = mode
+    if interval is not None:
+        PROGRESS_INTERVAL = interval
+
+def get_cache_dir(*subdirs):
+    if CACHE_DIR:
+        base_dir = CACHE_DIR
+    elif os.name == 'nt':
+        base_dir = os.path.join(os.environ.get('LOCALAPPDATA') or os.path.expanduser('~'), 'drtv-dl', 'cache')
+    else:
+        base_dir = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'drtv-dl')
+    cache_dir = os.path.join(base_dir, *subdirs)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
@@ -0,0 +1,95 @@
+import time
+import sqlite3
+import threading
+
+from drtv_dl.logger import logger
+
+class SyncState:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._listings = {}
+        self._summaries = {}
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS episodes ("
+                "source_url TEXT, "
+                "season_id TEXT, "
+                "item_id TEXT, "
+                "validator TEXT, "
+                "synced_at REAL, "
+                "PRIMARY KEY (source_url, item_id))"
+            )
+        logger.debug(f"Opened sync state {path}")
+
+    def diff(self, source_url, episodes):
+        # Passes on the episodes that are new or now point at another video
+        # since they were last downloaded, as they come in. Changed ones are
+        # marked so they replace the earlier download. The listing is
+        # only kept for commit() once it has been read to the end.
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT item_id, season_id, validator FROM episodes WHERE source_url = ?", (source_url,)
+            ).fetchall()
+        known = {item_id: validator for item_id, _, validator in rows}
+        known_seasons = {season_id for _, season_id, _ in rows}
+
+        seasons = {}
+        counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+        for episode in episodes:
+            seasons.setdefault(episode['season_url'], (episode['season_id'], []))[1].append(episode)
+            validator = known.get(episode['id'])
+            if validator == episode['validator']:
+                counts['unchanged'] += 1
+                continue
+            counts['new' if validator is None else 'changed'] += 1
+            yield {**episode, 'changed': validator is not None}
+
+        new_seasons = len({season_id for season_id, _ in seasons.values()} - known_seasons)
+        self._listings[source_url] = seasons
+        self._summaries[source_url] = (
+            f"{counts['new']} new and {counts['changed']} changed episode(s) "
+            f"in {new_seasons} new season(s), {counts['unchanged']} unchanged"
+        )
+
+    def summary(self, source_url):
+        return self._summaries.get(source_url)
+
+    def commit(self, failures=()):
+        # Episodes are only recorded once they downloaded without errors, so
+        # failed ones show up as new or changed again on the next poll. A
+        # failed season may have been listed only in part, so it is not pruned.
+        failed_urls = {failure[1] for failure in failures}
+        failed_sources = {failure[3] for failure in failures}
+        listings, self._listings = self._listings, {}
+        self._summaries = {}
+        now = time.time()
+        with self._lock, self._connection:
+            for source_url, seasons in listings.items():
+                season_ids = [season_id for season_id, _ in seasons.values()]
+                if source_url not in failed_sources:
+                    self._connection.execute(
+                        f"DELETE FROM episodes WHERE source_url = ? AND season_id NOT IN ({', '.join('?' * len(season_ids))})",
+                        (source_url, *season_ids)
+                    )
+                for season_url, (season_id, episodes) in seasons.items():
+                    if season_url in failed_urls:
+                        continue
+                    item_ids = [episode['id'] for episode in episodes]
+                    self._connection.execute(
+                        f"DELETE FROM episodes WHERE source_url = ? AND season_id = ? AND item_id NOT IN ({', '.join('?' * len(item_ids))})",
+                        (source_url, season_id, *item_ids)
+                    )
+                    self._connection.executemany(
+                        "INSERT OR REPLACE INTO episodes (source_url, season_id, item_id, validator, synced_at) VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (source_url, season_id, episode['id'], episode['validator'], now)
+                            for episode in episodes if episode['url'] not in failed_urls
+                        ]
+                    )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import base64
+import threading
+from datetime import datetime
+
+from drtv_dl.logger import logger
+from drtv_dl.utils import settings
+from drtv_dl.utils.settings import get_cache_dir
+
+class TokenCache:
+    filename = 'anonymous_token.json'
+    default_lifetime = 3600
+    refresh_margin = 300
+
+    _memory = {}
+    _lock = threading.Lock()
+
+    def get(self, token_type):
+        with self._lock:
+            entry = self._memory.get(token_type)
+            if entry is None and settings.TOKEN_CACHE:
+                entry = self._load().get(token_type)
+                if entry:
+                    self._memory[token_type] = entry
+
+        if not entry or entry['expires_at'] - self.refresh_margin <= time.time():
+            return None
+        return entry['value']
+
+    def store(self, token_type, value, expires_at=None):
+        entry = {
+            'value': value,
+            'expires_at': expires_at or time.time() + self.default_lifetime,
+        }
+        with self._lock:
+            self._memory[token_type] = entry
+            if settings.TOKEN_CACHE:
+                tokens = self._load()
+                tokens[token_type] = entry
+                self._save(tokens)
+
+    def invalidate(self, token_type, value=None):
+        with self._lock:
+            entry = self._memory.get(token_type)
+            if value is not None and entry and entry['value'] != value:
+                return
+            self._memory.pop(token_type, None)
+            if settings.TOKEN_CACHE:
+                tokens = self._load()
+                if tokens.pop(token_type, None) is not None:
+                    self._save(tokens)
+
+    @staticmethod
+    def get_expiry(token_entry):
+        expiration_date = token_entry.get('expirationDate')
+        if expiration_date:
+            try:
+                return datetime.fromisoformat(expiration_date.replace('Z', '+00:00')).timestamp()
+            except ValueError:
+                logger.debug(f"Could not parse token expiration date: {expiration_date}")
+
+        # Fall back to the exp claim when the token is a JWT.
+        try:
+            payload = token_entry['value'].split('.')[1]
+            claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+            return float(claims['exp'])
+        except (IndexError, KeyError, TypeError, ValueError):
+            return None
+
+    def _get_path(self):
+        return os.path.join(get_cache_dir(), self.filename)
+
+    def _load(self):
+        try:
+            with open(self._get_path(), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.debug(f"Ignoring unreadable token cache: {e}")
+            return {}
+
+    def _save(self, tokens):
+        path = self._get_path()
+        temp_path = f"{path}.tmp"
+        try:
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(tokens, file)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.debug(f"Could not write token cache: {e}")
+
+
+token_cache = TokenCache()